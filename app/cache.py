@@ -0,0 +1,219 @@
+"""
+╔════════════════════════════════════════════════════════════════════════════╗
+║         RESULT CACHES - READ-MOSTLY DATA IN MEMORY                         ║
+║                                                                            ║
+║  Small per-process caches for rows that are read on hot paths but         ║
+║  almost never written (prices, tax rate, ...).                             ║
+║  Writers MUST invalidate the matching entry after they commit.             ║
+╚════════════════════════════════════════════════════════════════════════════╝
+
+These cache query RESULTS. SQLAlchemy's own statement cache (see
+query_cache_size in app/database.py) only skips SQL compilation - the
+query still goes to the database.
+"""
+
+import threading
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+
+# ────────────────────────────────────────────────────────────────────────────
+# SYSTEM SETTINGS
+# ────────────────────────────────────────────────────────────────────────────
+# key -> raw value string (None when the key is not set).
+# Entries expire after 60s, so other workers see admin changes within a
+# minute; the worker that handled the change drops its entry immediately.
+
+settings_cache = TTLCache(maxsize=256, ttl=60)
+_settings_lock = threading.Lock()
+
+
+@cached(settings_cache, key=lambda db, key: hashkey(key), lock=_settings_lock)
+def get_setting(db: Session, key: str):
+    """Return the stored value for a SystemSetting key, or None."""
+    return db.query(models.SystemSetting.value).filter(
+        models.SystemSetting.key == key
+    ).scalar()
+
+
+def get_settings(db: Session, keys) -> dict:
+    """
+    Batch version of get_setting(): {key: value or None} for every key.
+    Cached keys are answered from memory; the rest come from ONE
+    SELECT ... WHERE key IN (...) and are cached like get_setting() would.
+    """
+    values = {}
+    with _settings_lock:
+        for key in keys:
+            cache_key = hashkey(key)
+            if cache_key in settings_cache:
+                values[key] = settings_cache[cache_key]
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(db.query(models.SystemSetting.key, models.SystemSetting.value).filter(
+            models.SystemSetting.key.in_(missing)
+        ).all())
+        with _settings_lock:
+            for key in missing:
+                values[key] = settings_cache[hashkey(key)] = found.get(key)
+    return values
+
+
+def invalidate_setting(key: str):
+    """Drop one key from the settings cache (call after committing a change)."""
+    with _settings_lock:
+        settings_cache.pop(hashkey(key), None)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# DASHBOARD RESPONSES
+# ────────────────────────────────────────────────────────────────────────────
+# Aggregate reports (stats, revenue chart, top products) are read far more
+# often than sales happen. Responses are kept for 60s as serialized JSON +
+# ETag, keyed by endpoint + query params. Checkout clears this worker's
+# copy right away; other workers catch up when their entries expire.
+
+dashboard_cache = TTLCache(maxsize=64, ttl=60)
+dashboard_lock = threading.Lock()
+
+
+def invalidate_dashboard():
+    """Forget every cached dashboard response (call after a sale commits)."""
+    with dashboard_lock:
+        dashboard_cache.clear()
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# BARCODE SCANS
+# ────────────────────────────────────────────────────────────────────────────
+# barcode -> (name, price, stock_quantity) row, or None for unknown codes.
+# The same best sellers get scanned over and over. Only 30s, because stock
+# is part of the answer: writers on this worker (audit, checkout, new
+# product) drop their barcodes right away, other workers within 30s.
+
+barcode_cache = TTLCache(maxsize=1024, ttl=30)
+_barcode_lock = threading.Lock()
+
+
+@cached(barcode_cache, key=lambda db, barcode: hashkey(barcode), lock=_barcode_lock)
+def get_scanned_product(db: Session, barcode: str):
+    """Return (name, price, stock_quantity) for a barcode, or None."""
+    return db.execute(
+        select(
+            models.Product.name,
+            models.Product.price,
+            models.Product.stock_quantity
+        ).where(models.Product.barcode == barcode)
+    ).first()
+
+
+def invalidate_barcodes(*barcodes: str):
+    """Drop barcodes from the scan cache (call after committing a change)."""
+    with _barcode_lock:
+        for barcode in barcodes:
+            barcode_cache.pop(hashkey(barcode), None)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# PRINT QUEUE
+# ────────────────────────────────────────────────────────────────────────────
+# The PENDING job list, polled every few seconds by every staff screen.
+# Kept for 10s; upload (new job), print (PRINTED) and checkout (COLLECTED)
+# clear this worker's copy right away.
+
+print_queue_cache = TTLCache(maxsize=1, ttl=10)
+print_queue_lock = threading.Lock()
+
+
+def invalidate_print_queue():
+    """Forget the cached print queue (call after a job is added or changes status)."""
+    with print_queue_lock:
+        print_queue_cache.clear()
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# OWNER BRANCHES
+# ────────────────────────────────────────────────────────────────────────────
+# owner id -> frozenset of that owner's branch ids. Almost every owner
+# endpoint asks "is branch X mine?"; this answers it from memory.
+# create/delete branch drop the owner's entry on this worker; callers
+# re-read once on a miss (see _owns_branch in app/routers/staff.py), so a
+# branch created on another worker is never wrongly refused.
+#
+# STALENESS LIMIT: a branch DELETED on another worker stays in that
+# worker's set until the TTL runs out - up to 30 seconds. Reads may see it
+# as owned in that window; writes of a client-supplied branch id confirm
+# it in the database first (_owns_branch(..., verify=True)).
+
+owner_branches_cache = TTLCache(maxsize=1024, ttl=30)
+_owner_branches_lock = threading.Lock()
+
+
+@cached(owner_branches_cache, key=lambda db, owner_id: hashkey(owner_id), lock=_owner_branches_lock)
+def get_owner_branch_ids(db: Session, owner_id: int) -> frozenset:
+    """Ids of all branches owned by owner_id."""
+    return frozenset(db.scalars(
+        select(models.Branch.id).where(models.Branch.owner_id == owner_id)
+    ))
+
+
+def invalidate_owner_branches(owner_id: int):
+    """Forget one owner's branch ids (call after a branch is created/deleted)."""
+    with _owner_branches_lock:
+        owner_branches_cache.pop(hashkey(owner_id), None)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# AUTHENTICATED USERS
+# ────────────────────────────────────────────────────────────────────────────
+# user id -> AuthUser (id, username, email, role) for get_current_user,
+# which runs on every authenticated request. Read-only snapshot, not an ORM
+# object: it is shared between requests and sessions. Unknown ids are not
+# cached, so a freshly registered user is found right away.
+#
+# STALENESS LIMIT: update/delete staff drop the entry on THIS worker only.
+# Every other worker keeps its copy until the TTL runs out, so a deleted
+# or demoted user stays authorised there (old role) for up to 30 seconds.
+# Lower the ttl below if that window is too long.
+
+class AuthUser(NamedTuple):
+    """The logged-in user as seen by the auth dependencies."""
+    id: int
+    username: str
+    email: str
+    role: str
+
+
+auth_user_cache = TTLCache(maxsize=4096, ttl=30)
+_auth_user_lock = threading.Lock()
+
+
+def get_auth_user(db: Session, user_id: int) -> Optional[AuthUser]:
+    """Return the AuthUser for a user id, or None."""
+    with _auth_user_lock:
+        user = auth_user_cache.get(user_id)
+    if user is None:
+        row = db.execute(
+            select(
+                models.User.id,
+                models.User.username,
+                models.User.email,
+                models.User.role
+            ).where(models.User.id == user_id)
+        ).first()
+        if row is not None:
+            user = AuthUser(*row)
+            with _auth_user_lock:
+                auth_user_cache[user_id] = user
+    return user
+
+
+def invalidate_auth_user(user_id: int):
+    """Forget one cached user (call after the user is changed or deleted)."""
+    with _auth_user_lock:
+        auth_user_cache.pop(user_id, None)
@@ -7,9 +7,15 @@
 ╚════════════════════════════════════════════════════════════════════════════╝
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, MetaData, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.mysql import Insert as MySQLInsert
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool, StaticPool
+from contextvars import ContextVar
 import os
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -35,31 +41,183 @@ DATABASE_URL = os.getenv(
 # The Engine is SQLAlchemy's connection to the database.
 # Think of it as a "factory" that creates connections when needed.
 
+# Behind PgBouncer (transaction pooling) the app must not pool or
+# prepare statements itself - see POOL / ASYNC ENGINE below.
+USE_PGBOUNCER = os.getenv("USE_PGBOUNCER", "0") == "1"
+
+# Optional per-session statement timeout for PostgreSQL, in milliseconds.
+# Sent as a startup parameter, which PgBouncer rejects - behind PgBouncer
+# set it on the role instead: ALTER ROLE ... SET statement_timeout = ...
+STATEMENT_TIMEOUT_MS = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+
 # Configure connection arguments based on database type
 connect_args = {}
 if "sqlite" in DATABASE_URL:
     connect_args = {"check_same_thread": False}  # SQLite specific
+elif DATABASE_URL.startswith("postgresql") and STATEMENT_TIMEOUT_MS and not USE_PGBOUNCER:
+    connect_args = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+
+# ────────────────────────────────────────────────────────────────────────────
+# CONNECTION POOL
+# ────────────────────────────────────────────────────────────────────────────
+# The default pool (5 connections + 10 overflow) times out after 30s under
+# bursts of user traffic plus the printer watchdog. Tune it via env:
+#
+#   DB_POOL_SIZE     connections kept open         (default 20)
+#   DB_MAX_OVERFLOW  extra connections under load  (default 30)
+#   DB_POOL_TIMEOUT  seconds to wait for a slot    (default 10)
+#   DB_POOL_RECYCLE  seconds before a connection is replaced (default 3600)
+#
+# SQLite is a local file, so pool sizing is skipped there. An in-memory
+# SQLite database lives inside ONE connection, so it gets a StaticPool.
+# With USE_PGBOUNCER=1 PgBouncer does the pooling: every checkout opens a
+# (cheap) PgBouncer connection and returns it immediately afterwards.
+pool_args = {}
+if USE_PGBOUNCER:
+    pool_args = {"poolclass": NullPool}
+elif DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+    pool_args = {"poolclass": StaticPool}
+elif "sqlite" not in DATABASE_URL:
+    pool_args = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "30")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),  # Beat server idle timeouts
+        "pool_pre_ping": True,   # Test connection before use (DB restarts)
+        "pool_use_lifo": True,   # Reuse the most recent (warm) connection first
+    }
+
+# ────────────────────────────────────────────────────────────────────────────
+# COMPILED STATEMENT CACHE
+# ────────────────────────────────────────────────────────────────────────────
+# SQLAlchemy caches the compiled SQL of every statement shape it has seen,
+# so repeat queries (barcode lookup, printer list, order insert) skip the
+# ORM compiler. The default 500 entries churns once all endpoints are warm.
+#
+#   DB_QUERY_CACHE_SIZE  compiled statements kept  (default 1200)
+#   DB_ECHO=1            log SQL; each line shows "cached since Xs ago"
+#                        on a hit or "generated in Xs" on a miss
+engine_args = {
+    "query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "1200")),
+    "echo": os.getenv("DB_ECHO", "0") == "1",
+    # Multi-row inserts go out as INSERT ... VALUES (...),(...),... in
+    # pages of this many rows ("insertmanyvalues"), instead of N INSERTs
+    "insertmanyvalues_page_size": 1000,
+}
+
+# psycopg2 only: also batch executemany() UPDATE/DELETE statements
+# (execute_batch) instead of sending them one at a time.
+sync_engine_args = {}
+if make_url(DATABASE_URL).get_dialect().driver == "psycopg2":
+    sync_engine_args = {"executemany_mode": "values_plus_batch"}
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args=connect_args
+    connect_args=connect_args,
+    **engine_args,
+    **sync_engine_args,
+    **pool_args
 )
 
 # ────────────────────────────────────────────────────────────────────────────
 # SESSION FACTORY
 # ────────────────────────────────────────────────────────────────────────────
 # A "session" is a conversation with the database.
-# SessionLocal is a factory that creates new sessions.
+# SessionLocal is a registry that hands out ONE session per HTTP request.
 # 
 # Each HTTP request gets its own session.
-# When request ends, session closes.
+# When request ends, session is removed from the registry.
+#
+# The registry is keyed by `request_scope`, a context variable set by
+# RequestScopeMiddleware (app/middleware.py). A plain thread-local scope
+# is NOT safe here: FastAPI may open get_db() and run the endpoint on
+# different threadpool threads. Outside a request (scripts, shell) the
+# session is scoped to the current thread.
+#
+# expire_on_commit=False: by default commit() expires every loaded object,
+# so the next attribute read (e.g. f"... {staff.username}" after a commit)
+# quietly re-SELECTs the row. Sessions here live for one request, so the
+# values in memory are the ones just written - call db.refresh(obj)
+# explicitly where a fresh copy from the database is really needed.
+
+request_scope: ContextVar = ContextVar("request_scope", default=None)
+
+
+def _session_scope():
+    scope = request_scope.get()
+    return scope if scope is not None else threading.get_ident()
 
-SessionLocal = sessionmaker(
+
+session_factory = sessionmaker(
     autocommit=False,  # Don't auto-commit (we control when to save)
     autoflush=False,   # Don't auto-flush (we control when to sync)
+    expire_on_commit=False,  # Objects stay usable after commit (no re-SELECT)
     bind=engine        # Use the engine above
 )
 
+SessionLocal = scoped_session(session_factory, scopefunc=_session_scope)
+
+# ────────────────────────────────────────────────────────────────────────────
+# ASYNC ENGINE + SESSION FACTORY
+# ────────────────────────────────────────────────────────────────────────────
+# Background coroutines (e.g. the SNMP printer watchdog) run ON the event
+# loop. A sync session there blocks every other request while it waits on
+# the database, so they use an async driver instead:
+#
+#   postgresql://...  ->  postgresql+asyncpg://...
+#   sqlite:///...     ->  sqlite+aiosqlite:///...
+#
+# Regular `def` endpoints keep using SessionLocal / get_db (FastAPI runs
+# them in its threadpool).
+
+def _async_url(url: str) -> str:
+    """Rewrite a sync DATABASE_URL to its async-driver equivalent."""
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+")[0]
+    if driver == "postgresql":
+        return f"postgresql+asyncpg{sep}{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+# asyncpg prepares every statement; in transaction pooling mode the next
+# transaction may land on a server connection that never saw it, so the
+# statement caches are switched off behind PgBouncer.
+async_connect_args = {}
+if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+    if USE_PGBOUNCER:
+        async_connect_args = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    elif STATEMENT_TIMEOUT_MS:
+        async_connect_args = {"server_settings": {"statement_timeout": STATEMENT_TIMEOUT_MS}}
+
+# The async engine only serves background coroutines, the dashboard
+# overview and the upload endpoint (a handful of concurrent queries), so
+# it gets its own, smaller pool instead of a second copy of the request pool:
+#
+#   DB_ASYNC_POOL_SIZE     (default 5)
+#   DB_ASYNC_MAX_OVERFLOW  (default 5)
+async_pool_args = dict(pool_args)
+if "pool_size" in pool_args:
+    async_pool_args["pool_size"] = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+    async_pool_args["max_overflow"] = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5"))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=async_connect_args,
+    **engine_args,
+    **async_pool_args
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,  # Objects stay usable after commit (no re-SELECT)
+    autoflush=False
+)
+
 # ────────────────────────────────────────────────────────────────────────────
 # DECLARATIVE BASE
 # ────────────────────────────────────────────────────────────────────────────
@@ -69,8 +227,19 @@ SessionLocal = sessionmaker(
 # When we later do: Base.metadata.create_all(bind=engine)
 # SQLAlchemy looks at all classes inheriting from Base
 # and creates corresponding tables in the database.
+#
+# The naming convention gives every index/constraint a predictable name,
+# so migrations (Alembic autogenerate) can find and alter them reliably.
+
+NAMING_CONVENTION = {
+    "ix": "ix_%(column_0_label)s",
+    "uq": "uq_%(table_name)s_%(column_0_name)s",
+    "ck": "ck_%(table_name)s_%(constraint_name)s",
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+    "pk": "pk_%(table_name)s",
+}
 
-Base = declarative_base()
+Base = declarative_base(metadata=MetaData(naming_convention=NAMING_CONVENTION))
 
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -98,7 +267,7 @@ def get_db():
     2. It creates a session (yield)
     3. Endpoint uses the session
     4. Endpoint finishes
-    5. Finally block closes the session
+    5. Finally block closes the session and clears it from the registry
     
     Why? Ensures database connections are properly managed.
     """
@@ -106,4 +275,81 @@ def get_db():
     try:
         yield db  # Give the session to the endpoint
     finally:
-        db.close()  # Always close the connection when done
+        SessionLocal.remove()  # Close the session and forget it
+
+
+async def get_async_db():
+    """
+    Async twin of get_db() for `async def` endpoints.
+
+    Usage:
+        async def my_endpoint(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(...))
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# BULK INSERT
+# ────────────────────────────────────────────────────────────────────────────
+# The batched path: passing a LIST of dicts to session.execute(insert(...))
+# sends one multi-row INSERT per page (see insertmanyvalues_page_size)
+# instead of one INSERT per db.add(). Use it for anything that writes
+# more than a handful of rows at once (order items, recipes, permissions).
+#
+#   bulk_insert(db, models.OrderItem, [{"order_id": 1, ...}, ...])
+#
+# Rows are not returned as ORM objects; commit is left to the caller.
+
+def bulk_insert(db, model, rows):
+    """Insert a list of dicts into model's table in batched statements."""
+    if rows:
+        db.execute(insert(model), rows)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# DIALECT-AWARE INSERT (for UPSERTs)
+# ────────────────────────────────────────────────────────────────────────────
+# "INSERT ... ON CONFLICT DO UPDATE" is not portable SQL, so SQLAlchemy
+# exposes it on each dialect's own insert(). This picks the right one for
+# whatever database the session is bound to:
+#
+#   stmt = dialect_insert(db, models.SystemSetting).values(...)
+#   stmt = stmt.on_conflict_do_update(index_elements=[...], set_={...})
+#
+# MySQL/MariaDB spell it "ON DUPLICATE KEY UPDATE". MySQLUpsert accepts the
+# same on_conflict_* calls and .excluded, so callers never check the backend.
+# MySQL has no RETURNING: to tell "inserted" from "skipped", read rowcount.
+
+class MySQLUpsert(MySQLInsert):
+    """MySQL insert() answering to the PostgreSQL/SQLite UPSERT spelling."""
+    inherit_cache = True
+
+    @property
+    def excluded(self):
+        # The row that was about to be inserted (VALUES(col) in MySQL)
+        return self.inserted
+
+    def on_conflict_do_update(self, index_elements=None, set_=None):
+        # MySQL finds the conflicting unique key itself: index_elements is unused
+        return self.on_duplicate_key_update(set_)
+
+    def on_conflict_do_nothing(self, index_elements=None):
+        # INSERT IGNORE: a duplicate is skipped with rowcount 0. (It also
+        # downgrades other errors, e.g. a too-long string, to warnings.)
+        return self.prefix_with("IGNORE")
+
+
+def dialect_insert(db, model):
+    """Return the PostgreSQL/SQLite/MySQL insert() construct for db's backend."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect in ("mysql", "mariadb"):
+        insert = MySQLUpsert
+    else:
+        raise NotImplementedError(f"UPSERT not supported on {dialect}")
+    return insert(model)
@@ -9,8 +9,12 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app import models
 from app.database import engine
+from app.middleware import RequestScopeMiddleware, ETagMiddleware
+from app.utils.logging_setup import setup_logging, shutdown_logging
+from app.services.snmp_svc import close_snmp_engine
 from app.routers import upload, staff, inventory, pos, admin, auth, dashboard
 from fastapi.staticfiles import StaticFiles
 import os
@@ -23,7 +27,12 @@ import os
 # 
 # Think of models.Base as a "blueprint registry" - SQLAlchemy tracks
 # all classes that inherit from Base, and create_all() creates them.
-models.Base.metadata.create_all(bind=engine)
+#
+# create_all() inspects every table on each start (every worker, every
+# --reload). In production set AUTO_CREATE_TABLES=0 and manage the schema
+# with migrations instead.
+if os.getenv("AUTO_CREATE_TABLES", "1") == "1":
+    models.Base.metadata.create_all(bind=engine)
 
 # ────────────────────────────────────────────────────────────────────────────
 # STEP 2: CREATE THE FASTAPI APP INSTANCE
@@ -32,7 +41,10 @@ models.Base.metadata.create_all(bind=engine)
 # This is what receives HTTP requests and sends responses.
 # 
 # The 'title' parameter appears in the auto-generated docs at /docs
+# ORJSONResponse encodes every JSON reply with orjson (Rust) instead of
+# the stdlib json module - several times faster on large lists.
 app = FastAPI(
+    default_response_class=ORJSONResponse,
     title="PrintSync API",
     description="Point-of-Sale System with Document Printing",
     version="1.0.0"
@@ -42,8 +54,20 @@ app = FastAPI(
 # ensure static exists
 os.makedirs("static/uploads", exist_ok=True)
 
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets the browser reuse a file for an hour."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", "public, max-age=3600")
+        return response
+
+
 # mount static directory
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Development only: in production let nginx/Caddy serve /static/ directly
+# (see README) so file bytes never pass through Python.
+app.mount("/static", CachedStaticFiles(directory="static", check_dir=False), name="static")
 # ────────────────────────────────────────────────────────────────────────────
 # STEP 3: ADD MIDDLEWARE (OPTIONAL BUT GOOD PRACTICE)
 # ────────────────────────────────────────────────────────────────────────────
@@ -58,6 +82,12 @@ app.add_middleware(
     allow_headers=["*"],   # Accept any headers
 )
 
+# One database session per request (see app/database.py)
+app.add_middleware(RequestScopeMiddleware)
+
+# ETag + 304 Not Modified for GET JSON responses (cheap repeat polls)
+app.add_middleware(ETagMiddleware)
+
 # ────────────────────────────────────────────────────────────────────────────
 # STEP 4: INCLUDE ROUTERS
 # ────────────────────────────────────────────────────────────────────────────
@@ -83,10 +113,19 @@ app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin Config"])
 
 @app.on_event("startup")
 async def startup_event():
+    # Background services log through a queue (see app/utils/logging_setup.py)
+    setup_logging()
+
     # Server starts without starting the watchdog
     # User must manually start it via the endpoint
     print(" [STARTUP] Server initialized. Printer watchdog is INACTIVE. Use POST /api/v1/admin/printer/control {\"action\": \"start\"} to activate.")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    close_snmp_engine()  # Printer polling sockets
+    shutdown_logging()  # Flush pending log lines
+
 # ────────────────────────────────────────────────────────────────────────────
 # STEP 5: DEFINE ENDPOINTS
 # ────────────────────────────────────────────────────────────────────────────
@@ -109,6 +148,10 @@ async def read_root():
     }
 
 
+# The health payload never changes, so its ETag is fixed too
+HEALTH_ETAG = '"health-v1"'
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -116,7 +159,11 @@ async def health_check():
     
     Used by monitoring tools to check if API is alive.
     Returns immediately with status.
+    Pollers that send If-None-Match: "health-v1" get an empty 304.
     
     Usage: curl http://localhost:8000/health
     """
-    return {"status": "healthy", "message": "All systems operational"}
\ No newline at end of file
+    return ORJSONResponse(
+        {"status": "healthy", "message": "All systems operational"},
+        headers={"ETag": HEALTH_ETAG, "Cache-Control": "max-age=5"}
+    )
\ No newline at end of file
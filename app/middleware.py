@@ -0,0 +1,130 @@
+"""
+ASGI middleware used by the application.
+
+Written as plain ASGI callables (not BaseHTTPMiddleware) so they add no
+extra task or response buffering per request.
+"""
+
+import hashlib
+
+from starlette.datastructures import MutableHeaders
+
+from app.database import request_scope
+
+
+class RequestScopeMiddleware:
+    """
+    Marks the start/end of each HTTP request for the scoped SessionLocal.
+
+    Every request gets a fresh scope token, which the session registry in
+    app/database.py uses as its key. The token is copied into threadpool
+    workers along with the rest of the context, so get_db() and the
+    endpoint see the same session whichever thread they run on.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = request_scope.set(object())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body: quoted BLAKE2b-128 hex digest."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class ETagMiddleware:
+    """
+    Adds an ETag to successful GET JSON responses and answers
+    304 Not Modified when the client already has that version.
+
+    The ETag is a BLAKE2b-128 hash of the body unless the endpoint set its
+    own (or answered the 304 itself, like the cached dashboard reports).
+    Pollers then get an empty 304 instead of the same JSON again: monitoring
+    on /health, the printer list (/admin/printer/logs) and product list
+    pages of up to PRODUCT_STREAM_THRESHOLD rows.
+
+    Streamed responses (more than one body chunk) pass through untouched,
+    with no ETag - e.g. product list pages above that threshold.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+                break
+
+        start_message = None
+        passthrough = False
+
+        async def send_with_etag(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                content_type = headers.get("content-type", "")
+                if message["status"] != 200 or not content_type.startswith("application/json"):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message  # Hold it until the body is known
+                return
+
+            if message.get("more_body", False):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start_message)
+            etag = headers.get("etag")
+            if etag is None:
+                etag = make_etag(body)
+                headers["etag"] = etag
+
+            if if_none_match and etag_matches(if_none_match, etag):
+                not_modified = [
+                    (name, value) for name, value in start_message["headers"]
+                    if name not in (b"content-length", b"content-type")
+                ]
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,115 @@
+"""
+╔════════════════════════════════════════════════════════════════════════════╗
+║           SQLITE MIGRATION - REBUILD AN OLD DATABASE FILE                  ║
+║                                                                            ║
+║  create_all() only creates MISSING tables; it never changes old ones.      ║
+║  This script copies an existing SQLite database into fresh tables built    ║
+║  from the current models, converting the data on the way.                  ║
+╚════════════════════════════════════════════════════════════════════════════╝
+
+Usage (from the project root):
+
+    python -m app.migrate_db              # the DATABASE_URL file (test.db)
+    python -m app.migrate_db other.db     # any other SQLite file
+
+The original file is kept next to the new one as <name>.bak.
+PostgreSQL and other servers are migrated with ALTER TABLE (see README).
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import DATABASE_URL
+from app.services.reports_svc import rebuild_daily_revenue, rebuild_product_sales
+
+# Timestamps that used to be filled with datetime.now() - the machine's
+# LOCAL time - and are now stamped by the database: CURRENT_TIMESTAMP, which
+# SQLite gives in UTC. Old rows are converted so one table never mixes both.
+LOCAL_TIME_COLUMNS = {
+    "print_jobs": {"created_at"},
+    "orders": {"created_at"},
+    "branches": {"created_at"},
+    "users": {"created_at"},
+    "printer_logs": {"recorded_at"},
+    "permissions": {"granted_at"},
+}
+
+
+def _local_to_utc(value: datetime) -> datetime:
+    """Naive local time -> naive UTC, the way SQLite stores CURRENT_TIMESTAMP."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def migrate(path: str):
+    """Rebuild the SQLite file at `path` from the current models."""
+    new_path = path + ".new"
+    if os.path.exists(new_path):
+        os.remove(new_path)
+
+    old_engine = create_engine(f"sqlite:///{path}")
+    new_engine = create_engine(f"sqlite:///{new_path}")
+    models.Base.metadata.create_all(bind=new_engine)
+
+    old_tables = set(inspect(old_engine).get_table_names())
+    with old_engine.connect() as old, new_engine.begin() as new:
+        # Any order works: SQLite only checks foreign keys when
+        # PRAGMA foreign_keys is on, and this engine leaves it off.
+        for table in models.Base.metadata.tables.values():
+            if table.name not in old_tables:
+                continue  # New table - create_all() already made it
+            old_columns = {
+                c["name"]: c for c in inspect(old_engine).get_columns(table.name)
+            }
+            # Still local time: the old column had no database default, so
+            # every value in it came from datetime.now()
+            local_time = {
+                name for name in LOCAL_TIME_COLUMNS.get(table.name, ())
+                if name in old_columns and old_columns[name]["default"] is None
+            }
+            columns = [
+                # Old tables allowed NULL where the model now requires a
+                # server default (created_at) - fill those from it
+                func.coalesce(c, c.server_default.arg).label(c.name)
+                if c.server_default is not None and not c.nullable
+                and c.name not in local_time else c
+                for c in table.columns if c.name in old_columns
+            ]
+
+            # Read and write through the MODEL columns: CodedEnum passes old
+            # text values ('STAFF') through on read and stores them as
+            # their SMALLINT code (1) on insert.
+            rows = [dict(row._mapping) for row in old.execute(select(*columns))]
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            for row in rows:
+                for name in local_time:
+                    row[name] = _local_to_utc(row[name]) if row[name] is not None else now
+            if rows:
+                new.execute(table.insert(), rows)
+            print(f"{table.name}: {len(rows)} rows")
+
+    # The dashboard rollups are recomputed from the copied orders
+    with Session(new_engine) as db:
+        rebuild_daily_revenue(db)
+        rebuild_product_sales(db)
+
+    old_engine.dispose()
+    new_engine.dispose()
+    os.replace(path, path + ".bak")
+    os.replace(new_path, path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        db_path = sys.argv[1]
+    else:
+        url = make_url(DATABASE_URL)
+        if url.get_backend_name() != "sqlite" or not url.database:
+            sys.exit("DATABASE_URL is not a SQLite file - migrate it with ALTER TABLE (see README)")
+        db_path = url.database
+    migrate(db_path)
@@ -8,16 +8,68 @@
 ╚════════════════════════════════════════════════════════════════════════════╝
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from enum import IntEnum
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, Float, ForeignKey, Date, DateTime, Index, UniqueConstraint, select, text
+from sqlalchemy.orm import relationship, column_property
+from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from .database import Base
 
 
+# ────────────────────────────────────────────────────────────────────────────
+# COMPACT STATUS COLUMNS
+# ────────────────────────────────────────────────────────────────────────────
+# Columns with a small, fixed set of values (job status, role, item type)
+# are stored as a 2-byte SMALLINT code instead of repeating the text in
+# every row and index entry. The rest of the app still sees the names:
+#
+#   job.status = "PRINTED"                 -> stored as 2
+#   PrintJob.status == "PENDING"           -> WHERE status = 0
+#   job.status                             -> "PRINTED"
+#
+# Codes are fixed by the IntEnums below - only ever ADD new members.
+
+class JobStatus(IntEnum):
+    PENDING = 0
+    PRINTING = 1
+    PRINTED = 2
+    COLLECTED = 3
+
+
+class UserRole(IntEnum):
+    OWNER = 0
+    STAFF = 1
+
+
+class ItemType(IntEnum):
+    RETAIL = 0
+    SERVICE = 1
+
+
+class CodedEnum(TypeDecorator):
+    """SMALLINT column that reads and writes IntEnum member names."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_cls):
+        super().__init__()
+        self.enum_cls = enum_cls
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return self.enum_cls[value].value
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value  # Rows written before the switch still hold text
+        return self.enum_cls(value).name
+
+
 class SystemSetting(Base):
     __tablename__ = "system_settings"
 
-    key = Column(String, primary_key=True, index=True) # e.g., "price_bw_a4", "tax_rate"
+    key = Column(String, primary_key=True) # e.g., "price_bw_a4", "tax_rate"
     value = Column(String) # e.g., "0.50", "18.0"
     description = Column(String) # "Price for B&W A4 Print"
 # ────────────────────────────────────────────────────────────────────────────
@@ -40,12 +92,17 @@ class PrintJob(Base):
     └──────────────┴──────────────────────┘
     """
     __tablename__ = "print_jobs"
+    __table_args__ = (
+        # Print queue: WHERE status = PENDING ORDER BY created_at
+        Index("ix_printjob_status_created", "status", "created_at"),
+    )
     
     # PRIMARY KEY - Unique identifier for this record
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # BUSINESS DATA
-    # Unique 4-digit code shown to customer (e.g., #4492)
+    # Unique code shown to customer: the id as 5+ digits (e.g., #00042);
+    # jobs from before that have a random 4-digit code (e.g., #4492)
     job_code = Column(String, unique=True, index=True)
     
     # Original filename (e.g., "resume.pdf")
@@ -63,10 +120,17 @@ class PrintJob(Base):
     
     # WORKFLOW STATUS
     # Possible values: "PENDING", "PRINTING", "PRINTED", "COLLECTED"
-    status = Column(String, default="PENDING")
+    status = Column(CodedEnum(JobStatus), default="PENDING")
     
-    # When this record was created
-    created_at = Column(DateTime, default=datetime.now)
+    # When the job was last set to PRINTING. A claim older than
+    # PRINT_CLAIM_TIMEOUT (app/routers/staff.py) is from a worker that died
+    # before finishing, and the job may be printed again.
+    printing_started_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # When this record was created (filled in by the database).
+    # default= puts CURRENT_TIMESTAMP in the INSERT itself, so rows also get
+    # a time in tables created before server_default= existed.
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
 
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -87,11 +151,21 @@ class Product(Base):
     └──────────────┴─────────────────────────────────┘
     """
     __tablename__ = "products"
+    __table_args__ = (
+        # Partial index holding ONLY the low-stock rows, so the dashboard's
+        # "stock_quantity < 10" count reads a handful of entries, not the table.
+        # Keep the predicate in step with LOW_STOCK_THRESHOLD in dashboard.py.
+        Index(
+            "ix_products_low_stock", "stock_quantity",
+            postgresql_where=text("stock_quantity < 10"),
+            sqlite_where=text("stock_quantity < 10")
+        ),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
-    # Product name
-    name = Column(String, index=True)
+    # Product name (not indexed: lookups go through barcode)
+    name = Column(String)
     
     # Barcode for quick lookup/scanning
     barcode = Column(String, unique=True, index=True)
@@ -124,7 +198,7 @@ class RawMaterial(Base):
     """
     __tablename__ = "raw_materials"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # Material name (e.g., "A4 Paper 80gsm")
     name = Column(String)
@@ -146,7 +220,8 @@ class ProductionRecipe(Base):
     raw_material_id = Column(Integer, ForeignKey("raw_materials.id"))
     quantity_required = Column(Float) # e.g., 1.0 (Sheet) or 0.05 (Ink)
     
-    material = relationship("RawMaterial")
+    # One material per rule: pull it in the same SELECT (JOIN)
+    material = relationship("RawMaterial", lazy="joined")
 
 # ────────────────────────────────────────────────────────────────────────────
 # MODEL 4: PRINTER - Hardware Devices
@@ -180,6 +255,9 @@ class Printer(Base):
     total_page_counter = Column(Integer, default=0)
     
     # Relationship to logs
+    # Left lazy on purpose: the log grows every watchdog cycle, so eager-loading
+    # the whole history with each printer would be far worse than N+1.
+    # Endpoints query PrinterLog directly (with LIMIT) instead.
     logs = relationship("PrinterLog", back_populates="printer")
 
 
@@ -199,6 +277,11 @@ class PrinterLog(Base):
     └────────────┴──────────┴─────────────────────┘
     """
     __tablename__ = "printer_logs"
+    __table_args__ = (
+        # Per-printer history: WHERE printer_id = ? ORDER BY recorded_at DESC LIMIT n
+        # is a range scan in index order - no sort, however long the log gets
+        Index("ix_printer_logs_printer_recorded", "printer_id", text("recorded_at DESC")),
+    )
     
     id = Column(Integer, primary_key=True)
     
@@ -208,8 +291,8 @@ class PrinterLog(Base):
     # Page counter value at this point in time
     page_count = Column(Integer)
     
-    # When this log entry was recorded
-    recorded_at = Column(DateTime, default=datetime.now)
+    # When this log entry was recorded (filled in by the database on INSERT)
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Additional info: pages printed since last check, status, etc.
     notes = Column(String, nullable=True)
@@ -221,20 +304,30 @@ class PrinterLog(Base):
 # 5. SALES ORDER (The Receipt)
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Dashboard reports filter and sort orders by date
+        Index("ix_orders_created_at", "created_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     total_amount = Column(Float, default=0.0)
     payment_method = Column(String, default="CASH") # CASH, M-PESA
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
     
     # Relationship to items
-    items = relationship("OrderItem", back_populates="order")
+    # "selectin" loads items for ALL fetched orders in one extra
+    # "WHERE order_id IN (...)" query instead of one query per order.
+    items = relationship("OrderItem", back_populates="order", lazy="selectin")
 
 # 6. ORDER ITEMS (Details of what was sold)
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # Order details / reports: WHERE order_id = ? [AND item_type = ?]
+        Index("ix_orderitem_order_type", "order_id", "item_type"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
     
     # What did they buy?
@@ -243,7 +336,7 @@ class OrderItem(Base):
     unit_price = Column(Float) # Snapshot of price
     
     # Type: "RETAIL" (Pen) or "SERVICE" (Print Job)
-    item_type = Column(String) 
+    item_type = Column(CodedEnum(ItemType))
     
     order = relationship("Order", back_populates="items")
 
@@ -257,8 +350,12 @@ class Branch(Base):
     Owner can create multiple branches, each managed by staff.
     """
     __tablename__ = "branches"
+    __table_args__ = (
+        # Every owner screen: WHERE owner_id = ?
+        Index("ix_branch_owner", "owner_id"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # Branch name (e.g., "Downtown Store", "Mall Outlet")
     name = Column(String, index=True)
@@ -273,7 +370,7 @@ class Branch(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     
     # When branch was created
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
     
     # Active or inactive
     is_active = Column(Boolean, default=True)
@@ -292,8 +389,13 @@ class User(Base):
     Roles: "OWNER" or "STAFF"
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # Staff of a branch: WHERE branch_id = ? [AND role = STAFF]
+        # (also the owner-dashboard join and branch delete's UPDATE)
+        Index("ix_user_branch_role", "branch_id", "role"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # Username for login
     username = Column(String, unique=True, index=True)
@@ -308,7 +410,7 @@ class User(Base):
     password_hash = Column(String)
     
     # Role: "OWNER" or "STAFF"
-    role = Column(String, default="STAFF")  # OWNER, STAFF
+    role = Column(CodedEnum(UserRole), default="STAFF")  # OWNER, STAFF
     
     # If STAFF, which branch are they assigned to?
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)
@@ -317,16 +419,33 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     
     # When user was created
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
     
     # Relationships
     branch = relationship("Branch", back_populates="staff", foreign_keys=[branch_id])
     owned_branches = relationship("Branch", back_populates="owner", foreign_keys="Branch.owner_id")
     
     # Each staff can have permissions
+    # Not eager: User rows are loaded on every authenticated request and
+    # nothing reads .permissions there; use selectinload() where it is needed.
     permissions = relationship("Permission", back_populates="user")
 
 
+# Branch.staff_count: number of STAFF users assigned to the branch, as a
+# correlated COUNT subquery (answered from ix_user_branch_role). It needs
+# the User class, so it is attached here rather than in Branch itself.
+# Deferred: only loaded when selected explicitly, e.g.
+#   select(Branch.id, Branch.name, Branch.staff_count)
+#   db.query(Branch).options(undefer(Branch.staff_count))
+Branch.staff_count = column_property(
+    select(func.count(User.id))
+    .where(User.branch_id == Branch.id, User.role == "STAFF")
+    .correlate_except(User)
+    .scalar_subquery(),
+    deferred=True
+)
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # MODEL 9: PERMISSION - Fine-grained access control
 # ────────────────────────────────────────────────────────────────────────────
@@ -336,8 +455,13 @@ class Permission(Base):
     Example: can_create_product, can_view_reports, can_refund
     """
     __tablename__ = "permissions"
+    __table_args__ = (
+        # A permission is granted at most once per user; the unique index
+        # also serves "does this user have X?" lookups
+        UniqueConstraint("user_id", "permission_name"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # User who has this permission
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -346,7 +470,44 @@ class Permission(Base):
     permission_name = Column(String, index=True)
     
     # When permission was granted
-    granted_at = Column(DateTime, default=datetime.now)
+    granted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationship
-    user = relationship("User", back_populates="permissions")
\ No newline at end of file
+    user = relationship("User", back_populates="permissions")
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# MODEL 10: DAILY REVENUE - Pre-aggregated sales per day (report rollup)
+# ────────────────────────────────────────────────────────────────────────────
+# The revenue chart reads ~7-30 of these rows instead of re-summing every
+# order in the window. Checkout adds each sale to its day's row in the same
+# transaction as the order (see app/services/reports_svc.py).
+class DailyRevenue(Base):
+    __tablename__ = "daily_revenue"
+    
+    # Calendar day, same as DATE(orders.created_at)
+    day = Column(Date, primary_key=True)
+    
+    # SUM(orders.total_amount) for that day
+    revenue = Column(Float, nullable=False, default=0.0)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# MODEL 11: PRODUCT SALES - Running totals per retail product (report rollup)
+# ────────────────────────────────────────────────────────────────────────────
+# "Top products" reads the first N rows of the qty_sold index instead of
+# grouping the whole order_items table. Checkout adds each RETAIL line here
+# in the same transaction as the order (see app/services/reports_svc.py).
+class ProductSales(Base):
+    __tablename__ = "product_sales_rollup"
+    __table_args__ = (
+        # Top sellers: ORDER BY qty_sold DESC LIMIT n
+        Index("ix_product_sales_qty_sold", text("qty_sold DESC")),
+    )
+    
+    # Same snapshot name as order_items.product_name
+    product_name = Column(String, primary_key=True)
+    
+    # SUM(quantity) and SUM(quantity * unit_price) over RETAIL order items
+    qty_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
\ No newline at end of file
@@ -1,12 +1,22 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, and_, select, insert, true
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, dialect_insert
 from app import models
 from pydantic import BaseModel
 from app.services.watchdog_svc import start_watchdog, stop_watchdog, is_watchdog_running
+from app.cache import invalidate_setting, invalidate_dashboard
+from app.services.reports_svc import rebuild_daily_revenue, rebuild_product_sales
 
 router = APIRouter()
 
+# Write statements built once at import and reused with bound parameters,
+# so each request skips statement construction and hits the compiled cache.
+INSERT_PRINTER = insert(models.Printer).returning(models.Printer.id)
+INSERT_PRINTER_LOG = insert(models.PrinterLog)
+INSERT_RECIPE = insert(models.ProductionRecipe)
+
 # --- 1. DYNAMIC PRICING INPUTS ---
 class SettingInput(BaseModel):
     key: str
@@ -15,15 +25,18 @@ class SettingInput(BaseModel):
 
 @router.post("/settings/")
 def update_setting(setting: SettingInput, db: Session = Depends(get_db)):
-    # Check if exists, update or create
-    existing = db.query(models.SystemSetting).filter(models.SystemSetting.key == setting.key).first()
-    if existing:
-        existing.value = setting.value
-    else:
-        new_setting = models.SystemSetting(**setting.dict())
-        db.add(new_setting)
-    
+    # Atomic UPSERT: insert, or update the existing row - one statement,
+    # no SELECT first, and no race between two admins saving the same key
+    stmt = dialect_insert(db, models.SystemSetting).values(
+        key=setting.key, value=setting.value, description=setting.description
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["key"],
+        set_={"value": stmt.excluded.value, "description": stmt.excluded.description}
+    )
+    db.execute(stmt)
     db.commit()
+    invalidate_setting(setting.key)  # Next read picks up the new value
     return {"message": f"Setting {setting.key} updated to {setting.value}"}
 
 # --- 2. DYNAMIC PRINTER INPUTS ---
@@ -34,24 +47,23 @@ class PrinterInput(BaseModel):
 
 @router.post("/printers/")
 def register_printer(printer: PrinterInput, db: Session = Depends(get_db)):
-    new_printer = models.Printer(name=printer.name, ip_address=printer.ip_address)
-    db.add(new_printer)
-    db.commit()
-    db.refresh(new_printer)
+    # INSERT ... RETURNING id: the new id comes back with the insert itself
+    printer_id = db.execute(
+        INSERT_PRINTER, {"name": printer.name, "ip_address": printer.ip_address}
+    ).scalar_one()
     
     # Create initial log entry for the new printer
-    initial_log = models.PrinterLog(
-        printer_id=new_printer.id,
-        page_count=0,
-        notes="Printer registered - Initial entry"
-    )
-    db.add(initial_log)
-    db.commit()
+    db.execute(INSERT_PRINTER_LOG, {
+        "printer_id": printer_id,
+        "page_count": 0,
+        "notes": "Printer registered - Initial entry"
+    })
+    db.commit()  # printer + seed log land together (one transaction)
     
     return {
         "message": "Printer Registered", 
-        "id": new_printer.id,
-        "ip_address": new_printer.ip_address,
+        "id": printer_id,
+        "ip_address": printer.ip_address,
         "initial_log": "Entry created"
     }
 
@@ -63,18 +75,36 @@ class RecipeInput(BaseModel):
 
 @router.post("/recipes/")
 def add_recipe_rule(recipe: RecipeInput, db: Session = Depends(get_db)):
-    new_rule = models.ProductionRecipe(
-        service_type=recipe.service_type,
-        raw_material_id=recipe.raw_material_id,
-        quantity_required=recipe.amount
-    )
-    db.add(new_rule)
+    db.execute(INSERT_RECIPE, {
+        "service_type": recipe.service_type,
+        "raw_material_id": recipe.raw_material_id,
+        "quantity_required": recipe.amount
+    })
     db.commit()
     return {"message": "Recipe Rule Added"}
 
 
 # --- 4. PRINTER LOGS ENDPOINT ---
-@router.get("/printer/logs/{printer_id}")
+# Response models: timestamps stay datetime objects and are formatted by
+# pydantic-core (Rust) while serializing, not by .isoformat() per row.
+class PrinterLogEntry(BaseModel):
+    timestamp: datetime
+    page_count: int | None
+    notes: str | None
+
+    class Config:
+        from_attributes = True
+
+
+class PrinterLogsResponse(BaseModel):
+    printer_name: str
+    printer_ip: str
+    current_page_count: int | None
+    total_logs: int
+    logs: list[PrinterLogEntry]
+
+
+@router.get("/printer/logs/{printer_id}", response_model=PrinterLogsResponse)
 def get_printer_logs(printer_id: int, limit: int = 50, db: Session = Depends(get_db)):
     """
     Get activity logs for a specific printer.
@@ -84,11 +114,21 @@ def get_printer_logs(printer_id: int, limit: int = 50, db: Session = Depends(get
     - printer_id: ID of the printer
     - limit: Maximum number of logs to return (default: 50)
     """
-    printer = db.query(models.Printer).filter(models.Printer.id == printer_id).first()
+    # Only the three columns shown (a plain row, so no relationship to lazy-load)
+    printer = db.query(
+        models.Printer.name,
+        models.Printer.ip_address,
+        models.Printer.total_page_counter
+    ).filter(models.Printer.id == printer_id).first()
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     
-    logs = db.query(models.PrinterLog).filter(
+    # Plain rows shaped like PrinterLogEntry - no ORM objects, no per-row dicts
+    logs = db.query(
+        models.PrinterLog.recorded_at.label("timestamp"),
+        models.PrinterLog.page_count,
+        models.PrinterLog.notes
+    ).filter(
         models.PrinterLog.printer_id == printer_id
     ).order_by(models.PrinterLog.recorded_at.desc()).limit(limit).all()
     
@@ -97,47 +137,97 @@ def get_printer_logs(printer_id: int, limit: int = 50, db: Session = Depends(get
         "printer_ip": printer.ip_address,
         "current_page_count": printer.total_page_counter,
         "total_logs": len(logs),
-        "logs": [
-            {
-                "timestamp": log.recorded_at.isoformat(),
-                "page_count": log.page_count,
-                "notes": log.notes
-            }
-            for log in logs
-        ]
+        "logs": logs
     }
 
 
-@router.get("/printer/logs")
-def list_all_printer_logs(db: Session = Depends(get_db)):
+class PrinterSummary(BaseModel):
+    id: int
+    name: str
+    ip_address: str
+    current_page_count: int | None
+    last_logged: datetime | None
+    last_notes: str | None
+
+    class Config:
+        from_attributes = True
+
+
+class PrinterListResponse(BaseModel):
+    printers: list[PrinterSummary]
+    total_count: int
+
+
+def _printers_with_latest_log(dialect: str):
     """
-    Get all registered printers with their latest log information.
+    SELECT every printer plus its newest log, columns labelled to match
+    PrinterSummary.
+    
+    PostgreSQL: LEFT JOIN LATERAL (... ORDER BY recorded_at DESC LIMIT 1),
+    one walk of ix_printer_logs_printer_recorded per printer - no sort,
+    no grouping of the whole log table.
+    Others (SQLite): join on MAX(id) per printer_id (logs are append-only,
+    so the highest id is the newest entry).
     """
-    printers = db.query(models.Printer).all()
+    columns = (
+        models.Printer.id,
+        models.Printer.name,
+        models.Printer.ip_address,
+        models.Printer.total_page_counter.label("current_page_count"),
+    )
     
-    result = []
-    for printer in printers:
-        latest_log = db.query(models.PrinterLog).filter(
-            models.PrinterLog.printer_id == printer.id
-        ).order_by(models.PrinterLog.recorded_at.desc()).first()
+    if dialect == "postgresql":
+        latest = select(
+            models.PrinterLog.recorded_at,
+            models.PrinterLog.notes
+        ).where(
+            models.PrinterLog.printer_id == models.Printer.id
+        ).order_by(models.PrinterLog.recorded_at.desc()).limit(1).lateral("latest_log")
         
-        result.append({
-            "id": printer.id,
-            "name": printer.name,
-            "ip_address": printer.ip_address,
-            "current_page_count": printer.total_page_counter,
-            "last_logged": latest_log.recorded_at.isoformat() if latest_log else None,
-            "last_notes": latest_log.notes if latest_log else None
-        })
+        return select(
+            *columns,
+            latest.c.recorded_at.label("last_logged"),
+            latest.c.notes.label("last_notes")
+        ).outerjoin(latest, true())
     
-    return {"printers": result, "total_count": len(result)}
+    latest_ids = select(
+        models.PrinterLog.printer_id,
+        func.max(models.PrinterLog.id).label("max_id")
+    ).group_by(models.PrinterLog.printer_id).subquery()
+    
+    return select(
+        *columns,
+        models.PrinterLog.recorded_at.label("last_logged"),
+        models.PrinterLog.notes.label("last_notes")
+    ).outerjoin(
+        latest_ids, latest_ids.c.printer_id == models.Printer.id
+    ).outerjoin(
+        models.PrinterLog,
+        and_(
+            models.PrinterLog.printer_id == models.Printer.id,
+            models.PrinterLog.id == latest_ids.c.max_id
+        )
+    )
+
+
+@router.get("/printer/logs", response_model=PrinterListResponse)
+def list_all_printer_logs(db: Session = Depends(get_db)):
+    """
+    Get all registered printers with their latest log information.
+    One query: printers LEFT JOIN their newest log (highest log id).
+    
+    Not streamed: a shop has a few dozen printers at most, and a single
+    body lets ETagMiddleware answer the frontend's polling with 304s.
+    """
+    rows = db.execute(_printers_with_latest_log(db.get_bind().dialect.name)).all()
+    return {"printers": rows, "total_count": len(rows)}
 
 
 class PrinterControlInput(BaseModel):
     action: str  # "start", "stop", or "status"
 
 @router.post("/printer/control")
-async def control_printer_watchdog(request: PrinterControlInput, db: Session = Depends(get_db)):
+async def control_printer_watchdog(request: PrinterControlInput):
     """
     Unified endpoint to control printer watchdog.
     
@@ -182,4 +272,18 @@ async def control_printer_watchdog(request: PrinterControlInput, db: Session = D
             "status": "error",
             "message": f"Invalid action: {action}",
             "valid_actions": ["start", "stop", "status"]
-        }
\ No newline at end of file
+        }
+
+
+# --- 5. REPORT ROLLUPS ---
+@router.post("/rollups/rebuild")
+def rebuild_report_rollups(db: Session = Depends(get_db)):
+    """
+    Recompute the pre-aggregated report tables from the raw orders.
+    Run once after upgrading (to include orders made before the rollups
+    existed), or if the numbers ever drift.
+    """
+    rebuild_daily_revenue(db)
+    rebuild_product_sales(db)
+    invalidate_dashboard()
+    return {"message": "Report rollups rebuilt"}
@@ -5,11 +5,13 @@ Handles login, registration, and session management
 
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
 from pydantic import BaseModel
-from app.utils.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, hash_password, verify_password
+from app.utils.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, hash_password, verify_password, DUMMY_HASH
 
 router = APIRouter()
 
@@ -44,12 +46,27 @@ def login(credentials: LoginRequest, db: Session = Depends(get_db)):
     - Return JWT tokens
     - Implement rate limiting
     """
-    # Find user by username
-    user = db.query(models.User).filter(
+    # Find user by username - only the columns login needs (plain row, no ORM object)
+    user = db.query(
+        models.User.id,
+        models.User.username,
+        models.User.email,
+        models.User.role,
+        models.User.branch_id,
+        models.User.is_active,
+        models.User.password_hash
+    ).filter(
         models.User.username == credentials.username
     ).first()
     
-    if not user:
+    # Verify hashed password (supports long passwords)
+    # Unknown usernames are checked against DUMMY_HASH so they cost the same
+    # time as a wrong password - response timing doesn't reveal valid usernames.
+    # (login is a plain `def`, so this CPU-heavy check runs in the threadpool.)
+    password_ok = verify_password(
+        credentials.password, user.password_hash if user else DUMMY_HASH
+    )
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
@@ -62,13 +79,6 @@ def login(credentials: LoginRequest, db: Session = Depends(get_db)):
             detail="Account is inactive. Contact administrator."
         )
     
-    # Verify hashed password (supports long passwords)
-    if not verify_password(credentials.password, user.password_hash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid username or password"
-        )
-    
     # Create JWT access token
     token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     token = create_access_token({"sub": str(user.id), "role": user.role}, expires_delta=token_expires)
@@ -95,25 +105,19 @@ def register_owner(user: schemas.OwnerRegister, db: Session = Depends(get_db)):
     Multiple owners are allowed - each runs their own business.
     
     NOTE: Role is automatically set to OWNER - don't pass it in request.
-    """
-    # Check if username exists
-    existing_user = db.query(models.User).filter(
-        models.User.username == user.username
-    ).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
     
-    # Check if email exists
-    existing_email = db.query(models.User).filter(
-        models.User.email == user.email
+    Plain `def` on purpose: FastAPI runs it in the threadpool, so the slow
+    password hash below never blocks the event loop.
+    """
+    # Check username AND email in one query, then report which one clashed
+    conflict = db.query(models.User.username, models.User.email).filter(
+        or_(models.User.username == user.username, models.User.email == user.email)
     ).first()
-    if existing_email:
+    if conflict:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+            detail="Username already taken" if conflict.username == user.username
+            else "Email already registered"
         )
     
     # Create owner account
@@ -126,8 +130,15 @@ def register_owner(user: schemas.OwnerRegister, db: Session = Depends(get_db)):
     )
     
     db.add(new_owner)
-    db.commit()
-    db.refresh(new_owner)
+    try:
+        db.commit()  # INSERT ... RETURNING: id/created_at, no refresh() needed
+    except IntegrityError:
+        # Lost a race with a concurrent signup - the unique indexes caught it
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
     
     return new_owner
 
@@ -138,7 +149,15 @@ def get_current_user_info(user_id: int, db: Session = Depends(get_db)):
     Get current logged-in user information.
     Pass user_id from login response.
     """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = db.query(
+        models.User.id,
+        models.User.username,
+        models.User.email,
+        models.User.role,
+        models.User.branch_id,
+        models.User.is_active,
+        models.User.created_at
+    ).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
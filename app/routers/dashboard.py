@@ -3,17 +3,25 @@ Dashboard Router
 Provides analytics and statistics endpoints for the frontend dashboard
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
+import orjson
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from app.database import get_db
+from sqlalchemy import func, desc, select, literal_column, cast, Date
+from cachetools.keys import hashkey
+from app.database import get_db, AsyncSessionLocal, async_engine
 from app import models
+from app.cache import dashboard_cache, dashboard_lock
+from app.middleware import make_etag, etag_matches
 from pydantic import BaseModel
-from datetime import datetime, timedelta
 from typing import List
 
 router = APIRouter()
 
+# Products below this count as "low stock" (matches ix_products_low_stock)
+LOW_STOCK_THRESHOLD = 10
+
 
 # ──────────────────────────────────────────────────────────────────────────
 # RESPONSE MODELS
@@ -69,12 +77,197 @@ class RecentOrdersResponse(BaseModel):
     orders: List[RecentOrder]
 
 
+class DashboardOverviewResponse(BaseModel):
+    stats: StatsResponse
+    revenue: RevenueResponse
+    top_products: TopProductsResponse
+    recent_orders: RecentOrdersResponse
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# HELPERS
+# ──────────────────────────────────────────────────────────────────────────
+
+def _cached_report(request: Request, key, build) -> Response:
+    """
+    Serve a report from dashboard_cache as ready-made JSON + ETag.
+    
+    The cache holds (body bytes, ETag), so a hit costs no query and no
+    serialization, and a poll whose If-None-Match still matches gets an
+    empty 304 without touching the body at all. `build()` runs only on a
+    miss and returns the payload dict.
+    """
+    with dashboard_lock:
+        entry = dashboard_cache.get(key)
+    
+    if entry is None:
+        body = orjson.dumps(build())
+        entry = (body, make_etag(body))
+        with dashboard_lock:
+            dashboard_cache[key] = entry
+    
+    body, etag = entry
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def _day_spine(dialect: str, days: int):
+    """
+    Subquery with one row per calendar day for the `days` days before today,
+    in a single column "day" (comparable with DailyRevenue.day).
+    
+    "Today" is the DATABASE's date - the same clock record_sale() uses to
+    bucket sales - so an app server in another timezone can't shift the
+    window by a day around midnight.
+    
+    PostgreSQL: generate_series(). SQLite: a recursive CTE over 'YYYY-MM-DD'.
+    """
+    if dialect == "postgresql":
+        series = func.generate_series(
+            func.current_date() - days,
+            func.current_date() - 1,
+            literal_column("interval '1 day'")
+        ).table_valued("value")
+        return select(cast(series.c.value, Date).label("day")).subquery()
+    
+    first_day = func.date("now", f"-{days} days")
+    last_day = func.date("now", "-1 day")
+    spine = select(first_day.label("day")).cte("day_spine", recursive=True)
+    spine = spine.union_all(
+        select(func.date(spine.c.day, "+1 day")).where(spine.c.day < last_day)
+    )
+    return select(spine.c.day).where(spine.c.day <= last_day).subquery()
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# REPORT QUERIES
+# ──────────────────────────────────────────────────────────────────────────
+# Each report is a statement builder + a rows -> payload converter, so the
+# same SQL serves both the sync endpoints (Session) and the async overview
+# (AsyncSession).
+#
+# Payloads are plain dicts encoded by orjson in one C pass. The rows come
+# straight from our own SELECTs, so they skip per-field Pydantic validation;
+# the response models above only document the shape (OpenAPI).
+
+def _stats_stmt():
+    """All four numbers in ONE round trip: SELECT (subquery), (subquery), ..."""
+    return select(
+        # Total sales (sum of all orders)
+        select(func.coalesce(func.sum(models.Order.total_amount), 0.0)).scalar_subquery(),
+        # Total orders
+        select(func.count(models.Order.id)).scalar_subquery(),
+        # Total products
+        select(func.count(models.Product.id)).scalar_subquery(),
+        # Low stock items (stock_quantity < 10) - threshold inlined as SQL
+        # text, not a bound parameter, so the partial index
+        # ix_products_low_stock provably matches and gets used
+        select(func.count(models.Product.id)).where(
+            models.Product.stock_quantity < literal_column(str(LOW_STOCK_THRESHOLD))
+        ).scalar_subquery()
+    )
+
+
+def _stats_payload(rows) -> dict:
+    total_sales, total_orders, total_products, low_stock_items = rows[0]
+    return {
+        "total_sales": round(total_sales, 2),
+        "total_orders": total_orders,
+        "total_products": total_products,
+        "low_stock_items": low_stock_items
+    }
+
+
+def _revenue_stmt(dialect: str, days: int):
+    """
+    Pre-summed revenue per day (DailyRevenue rollup, kept up to date by
+    checkout) LEFT JOINed onto one row per calendar day, so the database
+    reads ~`days` rows and returns quiet days as 0.
+    """
+    spine = _day_spine(dialect, days)
+    return select(
+        spine.c.day,
+        func.coalesce(models.DailyRevenue.revenue, 0.0).label('revenue')
+    ).outerjoin(
+        models.DailyRevenue, models.DailyRevenue.day == spine.c.day
+    ).order_by(spine.c.day)
+
+
+def _revenue_payload(rows) -> dict:
+    return {"data": [
+        {"date": str(row.day), "revenue": round(row.revenue, 2)}
+        for row in rows
+    ]}
+
+
+def _top_products_stmt(limit: int):
+    """
+    Read the running totals (ProductSales rollup, RETAIL items only, kept
+    up to date by checkout) - the first `limit` entries of the qty_sold
+    index instead of grouping every order item.
+    """
+    return select(
+        models.ProductSales.product_name,
+        models.ProductSales.qty_sold.label('quantity_sold'),
+        models.ProductSales.revenue
+    ).order_by(
+        desc(models.ProductSales.qty_sold)
+    ).limit(limit)
+
+
+def _top_products_payload(rows) -> dict:
+    return {"products": [
+        {
+            "product_name": row.product_name,
+            "quantity_sold": row.quantity_sold,
+            "revenue": round(row.revenue, 2)
+        }
+        for row in rows
+    ]}
+
+
+def _recent_orders_stmt(limit: int):
+    """
+    Newest orders as plain columns (Order.items is never loaded), with the
+    item count as a correlated subquery: counted inside the same SELECT
+    (via the order_items.order_id index), only for the rows kept.
+    """
+    items_count = select(func.count(models.OrderItem.id)).where(
+        models.OrderItem.order_id == models.Order.id
+    ).correlate(models.Order).scalar_subquery()
+    
+    return select(
+        models.Order.id,
+        models.Order.total_amount,
+        models.Order.payment_method,
+        models.Order.created_at,
+        items_count.label("items_count")
+    ).order_by(
+        desc(models.Order.created_at)
+    ).limit(limit)
+
+
+def _recent_orders_payload(rows) -> dict:
+    return {"orders": [
+        {
+            "order_id": row.id,
+            "total_amount": round(row.total_amount, 2),
+            "payment_method": row.payment_method,
+            "created_at": row.created_at.isoformat(),
+            "items_count": row.items_count
+        }
+        for row in rows
+    ]}
+
+
 # ──────────────────────────────────────────────────────────────────────────
 # ENDPOINTS
 # ──────────────────────────────────────────────────────────────────────────
 
 @router.get("/stats", response_model=StatsResponse)
-def get_dashboard_stats(db: Session = Depends(get_db)):
+def get_dashboard_stats(request: Request, db: Session = Depends(get_db)):
     """
     Get overall dashboard statistics:
     - Total sales revenue
@@ -82,30 +275,14 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
     - Total products in inventory
     - Number of low stock items
     """
-    # Calculate total sales (sum of all orders)
-    total_sales = db.query(func.sum(models.Order.total_amount)).scalar() or 0.0
-    
-    # Count total orders
-    total_orders = db.query(models.Order).count()
-    
-    # Count total products
-    total_products = db.query(models.Product).count()
-    
-    # Count low stock items (stock_quantity < 10)
-    low_stock_items = db.query(models.Product).filter(
-        models.Product.stock_quantity < 10
-    ).count()
-    
-    return StatsResponse(
-        total_sales=round(total_sales, 2),
-        total_orders=total_orders,
-        total_products=total_products,
-        low_stock_items=low_stock_items
+    return _cached_report(
+        request, hashkey("stats"),
+        lambda: _stats_payload(db.execute(_stats_stmt()).all())
     )
 
 
 @router.get("/revenue", response_model=RevenueResponse)
-def get_revenue_data(days: int = 7, db: Session = Depends(get_db)):
+def get_revenue_data(request: Request, days: int = 7, db: Session = Depends(get_db)):
     """
     Get revenue data over the last N days (default 7).
     Returns daily revenue for chart visualization.
@@ -113,78 +290,26 @@ def get_revenue_data(days: int = 7, db: Session = Depends(get_db)):
     Query params:
     - days: Number of days to look back (default: 7)
     """
-    # Calculate date range
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # Query orders within date range
-    orders = db.query(
-        func.date(models.Order.created_at).label('date'),
-        func.sum(models.Order.total_amount).label('revenue')
-    ).filter(
-        models.Order.created_at >= start_date,
-        models.Order.created_at <= end_date
-    ).group_by(
-        func.date(models.Order.created_at)
-    ).order_by('date').all()
-    
-    # Format response
-    data_points = [
-        RevenueDataPoint(
-            date=str(order.date),
-            revenue=round(order.revenue, 2)
-        )
-        for order in orders
-    ]
-    
-    # Fill in missing dates with 0 revenue
-    date_map = {dp.date: dp.revenue for dp in data_points}
-    complete_data = []
-    
-    for i in range(days):
-        check_date = (start_date + timedelta(days=i)).date()
-        complete_data.append(
-            RevenueDataPoint(
-                date=str(check_date),
-                revenue=date_map.get(str(check_date), 0.0)
-            )
+    return _cached_report(
+        request, hashkey("revenue", days),
+        lambda: _revenue_payload(
+            db.execute(_revenue_stmt(db.get_bind().dialect.name, days)).all()
         )
-    
-    return RevenueResponse(data=complete_data)
+    )
 
 
 @router.get("/top-products", response_model=TopProductsResponse)
-def get_top_products(limit: int = 5, db: Session = Depends(get_db)):
+def get_top_products(request: Request, limit: int = 5, db: Session = Depends(get_db)):
     """
     Get top-selling products by quantity sold.
     
     Query params:
     - limit: Number of top products to return (default: 5)
     """
-    # Query top products from order items
-    top_products = db.query(
-        models.OrderItem.product_name,
-        func.sum(models.OrderItem.quantity).label('quantity_sold'),
-        func.sum(models.OrderItem.quantity * models.OrderItem.unit_price).label('revenue')
-    ).filter(
-        models.OrderItem.item_type == "RETAIL"  # Only retail products
-    ).group_by(
-        models.OrderItem.product_name
-    ).order_by(
-        desc('quantity_sold')
-    ).limit(limit).all()
-    
-    # Format response
-    products = [
-        TopProduct(
-            product_name=product.product_name,
-            quantity_sold=product.quantity_sold,
-            revenue=round(product.revenue, 2)
-        )
-        for product in top_products
-    ]
-    
-    return TopProductsResponse(products=products)
+    return _cached_report(
+        request, hashkey("top-products", limit),
+        lambda: _top_products_payload(db.execute(_top_products_stmt(limit)).all())
+    )
 
 
 @router.get("/recent-orders", response_model=RecentOrdersResponse)
@@ -195,27 +320,40 @@ def get_recent_orders(limit: int = 10, db: Session = Depends(get_db)):
     Query params:
     - limit: Number of orders to return (default: 10)
     """
-    # Query recent orders
-    orders = db.query(models.Order).order_by(
-        desc(models.Order.created_at)
-    ).limit(limit).all()
+    return ORJSONResponse(_recent_orders_payload(db.execute(_recent_orders_stmt(limit)).all()))
+
+
+async def _fetch_all(stmt):
+    """Run one statement on its OWN async session (= its own connection)."""
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(stmt)).all()
+
+
+@router.get("/overview", response_model=DashboardOverviewResponse)
+async def get_dashboard_overview(days: int = 7, limit: int = 5, orders_limit: int = 10):
+    """
+    Everything the dashboard page shows, in one request.
     
-    # Format response
-    recent_orders = []
-    for order in orders:
-        # Count items in this order
-        items_count = db.query(models.OrderItem).filter(
-            models.OrderItem.order_id == order.id
-        ).count()
-        
-        recent_orders.append(
-            RecentOrder(
-                order_id=order.id,
-                total_amount=round(order.total_amount, 2),
-                payment_method=order.payment_method,
-                created_at=order.created_at.isoformat(),
-                items_count=items_count
-            )
-        )
+    The four reports run CONCURRENTLY on separate pooled connections
+    (asyncio.gather), so the wait is the slowest query, not the sum of all
+    four - and no threadpool worker is held while they run.
+    
+    Query params:
+    - days: Revenue chart length (default: 7)
+    - limit: Number of top products (default: 5)
+    - orders_limit: Number of recent orders (default: 10)
+    """
+    dialect = async_engine.dialect.name
+    stats, revenue, top_products, recent_orders = await asyncio.gather(
+        _fetch_all(_stats_stmt()),
+        _fetch_all(_revenue_stmt(dialect, days)),
+        _fetch_all(_top_products_stmt(limit)),
+        _fetch_all(_recent_orders_stmt(orders_limit))
+    )
     
-    return RecentOrdersResponse(orders=recent_orders)
+    return ORJSONResponse({
+        "stats": _stats_payload(stats),
+        "revenue": _revenue_payload(revenue),
+        "top_products": _top_products_payload(top_products),
+        "recent_orders": _recent_orders_payload(recent_orders)
+    })
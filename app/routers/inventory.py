@@ -1,16 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from sqlalchemy import select, lambda_stmt, exists
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, session_factory
 from app import models, schemas
+from app.cache import invalidate_dashboard, get_scanned_product, invalidate_barcodes
 
 router = APIRouter()
 
+
+def _product_by_barcode(db: Session, barcode: str):
+    """
+    Barcode lookup used by every scan/audit.
+    lambda_stmt caches the statement by code location, so repeat scans skip
+    building and compiling the SELECT; `barcode` is sent as a bound parameter.
+    """
+    stmt = lambda_stmt(lambda: select(models.Product).where(models.Product.barcode == barcode))
+    return db.execute(stmt).scalars().first()
+
+
+# Pages up to this many rows are sent as one body (ETag / 304 for the
+# frontend's polling of the default 100-row page); larger ones are streamed.
+PRODUCT_STREAM_THRESHOLD = 500
+
+
+def _products_page(skip: int, limit: int):
+    """
+    SELECT for one page of the product list.
+    
+    Plain column rows: no Product objects / identity map, and no per-row
+    Pydantic validation of data that came straight from our own table -
+    orjson encodes each row directly.
+    """
+    return select(
+        models.Product.id,
+        models.Product.name,
+        models.Product.barcode,
+        models.Product.price,
+        models.Product.stock_quantity
+    ).offset(skip).limit(limit)
+
+
+def _stream_products(skip: int, limit: int):
+    """
+    Yield the product list JSON array in pieces, 500 rows per DB fetch.
+    
+    Runs after the endpoint has returned, so it opens its own session
+    instead of borrowing the request's (which get_db may already have closed).
+    """
+    db = session_factory()
+    try:
+        stmt = _products_page(skip, limit).execution_options(yield_per=500)
+        
+        yield b"["
+        first = True
+        for row in db.execute(stmt):
+            yield (b"" if first else b",") + orjson.dumps(row._asdict())
+            first = False
+        yield b"]"
+    finally:
+        db.close()
+
+
 # 0. Fetch All Products
-@router.get("/products/", response_model=list[schemas.ProductResponse])
+# Returns a Response itself: the schema only documents the shape in /docs
+@router.get("/products/", responses={200: {"model": list[schemas.ProductResponse]}})
 def get_all_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Fetch all products with pagination"""
-    products = db.query(models.Product).offset(skip).limit(limit).all()
-    return products
+    """
+    Fetch all products with pagination.
+    
+    Up to PRODUCT_STREAM_THRESHOLD rows: one body, so repeat polls get a
+    304 from ETagMiddleware. Larger pages are streamed instead (memory stays
+    flat however large `limit` is), at the cost of no ETag.
+    """
+    if limit > PRODUCT_STREAM_THRESHOLD:
+        return StreamingResponse(_stream_products(skip, limit), media_type="application/json")
+    rows = db.execute(_products_page(skip, limit)).all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
 # 0B. Fetch Product by ID
 @router.get("/products/{product_id}", response_model=schemas.ProductResponse)
@@ -24,21 +91,22 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
 # 1. Create New Product (Staff adds "Bic Pen")
 @router.post("/products/", response_model=schemas.ProductResponse)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
-    # Check if barcode exists
-    existing = db.query(models.Product).filter(models.Product.barcode == product.barcode).first()
-    if existing:
+    # Check if barcode exists (EXISTS -> bool, no Product object built)
+    if db.query(exists().where(models.Product.barcode == product.barcode)).scalar():
         raise HTTPException(status_code=400, detail="Barcode already exists")
     
     new_item = models.Product(**product.dict())
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
+    db.commit()  # INSERT ... RETURNING fills in the id - no refresh() needed
+    invalidate_dashboard()  # Product counts / low-stock changed
+    invalidate_barcodes(new_item.barcode)  # May have been cached as "not found"
     return new_item
 
 # 2. Scan Barcode (Used by Camera)
 @router.get("/scan/{barcode}")
 def scan_product(barcode: str, db: Session = Depends(get_db)):
-    item = db.query(models.Product).filter(models.Product.barcode == barcode).first()
+    # Repeat scans of the same item are served from memory (app/cache.py)
+    item = get_scanned_product(db, barcode)
     if not item:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -53,11 +121,13 @@ def scan_product(barcode: str, db: Session = Depends(get_db)):
 # 3. Stock Audit (Phone Update)
 @router.post("/audit/{barcode}")
 def update_stock(barcode: str, actual_qty: int, db: Session = Depends(get_db)):
-    item = db.query(models.Product).filter(models.Product.barcode == barcode).first()
+    item = _product_by_barcode(db, barcode)
     if not item:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Log the discrepancy (Logic can be expanded here)
     item.stock_quantity = actual_qty
     db.commit()
+    invalidate_dashboard()  # Product counts / low-stock changed
+    invalidate_barcodes(barcode)  # Scans must show the new stock
     return {"message": "Stock updated", "new_qty": actual_qty}
\ No newline at end of file
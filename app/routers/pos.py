@@ -1,37 +1,72 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, bulk_insert
 from app import models, schemas
 from app.services.stock_svc import deduct_stock_for_print
+from app.services.settings_svc import get_dynamic_prices
+from app.services.reports_svc import record_sale, record_product_sales
+from app.cache import invalidate_dashboard, invalidate_barcodes, invalidate_print_queue
 
 router = APIRouter()
 
+INSERT_ORDER = insert(models.Order).returning(models.Order.id)
+
 @router.post("/checkout/")
 def process_checkout(cart: schemas.CheckoutRequest, db: Session = Depends(get_db)):
     total_bill = 0.0
     order_items = []
+    retail_qty = {}  # barcode -> units to take from stock
+    
+    # --- PHASE 0: LOAD EVERYTHING IN THE CART (2 queries, any cart size) ---
+    # Products: name + price only. Stock is checked and taken in PHASE 2 by
+    # the UPDATE itself, so they need no lock. Jobs: FOR UPDATE locks them
+    # until commit, so one job can't be collected twice (ignored on SQLite).
+    barcodes = {item.id for item in cart.items if item.type == "PRODUCT"}
+    job_codes = {item.id for item in cart.items if item.type == "PRINT_JOB"}
+    
+    products = {}
+    if barcodes:
+        products = {
+            row.barcode: row for row in db.execute(
+                select(
+                    models.Product.barcode,
+                    models.Product.name,
+                    models.Product.price
+                ).where(models.Product.barcode.in_(barcodes))
+            )
+        }
+    jobs = {}
+    if job_codes:
+        jobs = {
+            j.job_code: j for j in db.query(models.PrintJob).filter(
+                models.PrintJob.job_code.in_(job_codes)
+            ).with_for_update().all()
+        }
+    
+    # Print prices (per page, from admin settings): both in one lookup
+    prices = {}
+    if jobs:
+        prices = get_dynamic_prices(db, {"price_color_a4": 0.50, "price_bw_a4": 0.10})
     
     # --- PHASE 1: VALIDATE & CALCULATE ---
     for item in cart.items:
         
         # A. If it's a Retail Product (Pen, Folder)
         if item.type == "PRODUCT":
-            product = db.query(models.Product).filter(models.Product.barcode == item.id).first()
+            product = products.get(item.id)
             if not product:
                 raise HTTPException(status_code=404, detail=f"Product {item.id} not found")
             
-            if product.stock_quantity < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Not enough stock for {product.name}")
-            
             # Add to bill
             line_total = product.price * item.quantity
             total_bill += line_total
             
-            # Deduct Retail Stock Immediately
-            product.stock_quantity -= item.quantity
+            # Retail stock is deducted in PHASE 2 (one UPDATE per product)
+            retail_qty[item.id] = retail_qty.get(item.id, 0) + item.quantity
             
             # Prepare Log
-            order_items.append(models.OrderItem(
+            order_items.append(dict(
                 product_name=product.name,
                 quantity=item.quantity,
                 unit_price=product.price,
@@ -40,13 +75,15 @@ def process_checkout(cart: schemas.CheckoutRequest, db: Session = Depends(get_db
 
         # B. If it's a Print Job (PDF)
         elif item.type == "PRINT_JOB":
-            job = db.query(models.PrintJob).filter(models.PrintJob.job_code == item.id).first()
+            job = jobs.get(item.id)
             if not job:
                 raise HTTPException(status_code=404, detail=f"Job {item.id} not found")
             
-            # Calculate Print Price (Simple Logic: $0.10 per page)
-            # In real app, fetch price from settings
-            price_per_page = 0.50 if job.is_color else 0.10
+            # Calculate Print Price (per page, from admin settings)
+            if job.is_color:
+                price_per_page = prices["price_color_a4"]
+            else:
+                price_per_page = prices["price_bw_a4"]
             line_total = (job.total_pages * price_per_page) * item.quantity
             total_bill += line_total
             
@@ -57,32 +94,62 @@ def process_checkout(cart: schemas.CheckoutRequest, db: Session = Depends(get_db
             deduct_stock_for_print(db, job.total_pages * item.quantity, job.is_color)
             
             # Prepare Log
-            order_items.append(models.OrderItem(
+            order_items.append(dict(
                 product_name=f"Print: {job.filename}",
                 quantity=item.quantity, # Copies
                 unit_price=line_total / item.quantity,
                 item_type="SERVICE"
             ))
 
-    # --- PHASE 2: SAVE ORDER ---
-    new_order = models.Order(
-        total_amount=total_bill,
-        payment_method=cart.payment_method
+    # --- PHASE 2: TAKE RETAIL STOCK ---
+    # Check-and-decrement in ONE statement: the database does the math and
+    # the WHERE guard under the row lock, so two tills selling the last pen
+    # can't both succeed (no lost update). 0 rows updated = not enough stock,
+    # and raising rolls the whole checkout back. Barcode order keeps
+    # concurrent checkouts locking rows in the same order (no deadlock).
+    for barcode in sorted(retail_qty):
+        qty = retail_qty[barcode]
+        updated = db.execute(
+            update(models.Product).where(
+                models.Product.barcode == barcode,
+                models.Product.stock_quantity >= qty
+            ).values(
+                stock_quantity=models.Product.stock_quantity - qty
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if updated == 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not enough stock for {products[barcode].name}"
+            )
+
+    # --- PHASE 3: SAVE ORDER ---
+    # INSERT ... RETURNING id: the new order id comes back from the insert
+    # itself - no ORM flush, no refresh, and nothing committed yet
+    order_id = db.execute(INSERT_ORDER, {
+        "total_amount": total_bill,
+        "payment_method": cart.payment_method
+    }).scalar_one()
+    
+    # Save Items - one multi-row INSERT for the whole cart
+    bulk_insert(
+        db, models.OrderItem,
+        [dict(log_item, order_id=order_id) for log_item in order_items]
     )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
     
-    # Save Items
-    for log_item in order_items:
-        log_item.order_id = new_order.id
-        db.add(log_item)
+    # Keep the report rollups in step (same transaction as the order)
+    record_sale(db, total_bill)
+    record_product_sales(db, order_items)
     
     db.commit()
+    invalidate_dashboard()  # New sale -> fresh stats on the next dashboard load
+    invalidate_barcodes(*products)  # Scans must show the reduced stock
+    if jobs:
+        invalidate_print_queue()  # Collected jobs leave the queue
 
     return {
         "status": "success",
-        "order_id": new_order.id,
+        "order_id": order_id,
         "total_paid": total_bill,
         "message": "Transaction Completed"
     }
\ No newline at end of file
@@ -1,61 +1,124 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from datetime import datetime, timedelta, timezone
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+import orjson
 import os
-from sqlalchemy.orm import Session
-from app.database import get_db
+import logging
+from sqlalchemy import exists, or_, select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, raiseload
+from cachetools import cached
+from cachetools.keys import hashkey
+from app.database import get_db, dialect_insert, session_factory
 from app import models, schemas
 from app.services.printer_svc import send_to_printer
 from app.services.stock_svc import deduct_stock_for_print
-from app.utils.auth import require_owner, require_staff, hash_password
+from app.utils.auth import AuthUser, require_owner, require_staff, hash_password
+from app.cache import print_queue_cache, print_queue_lock, invalidate_print_queue
+from app.cache import get_owner_branch_ids, invalidate_owner_branches, invalidate_auth_user
+from app.utils.responses import PydanticResponse
 
 router = APIRouter()
+logger = logging.getLogger("print_queue")
+
+# Endpoints here are plain `def`: they use the sync Session (and slow
+# password hashing), so FastAPI runs them in its threadpool. As `async def`
+# every query would block the event loop - and every other request.
+
+# List endpoints build plain dicts from these fields and return them as an
+# ORJSONResponse: orjson encodes them directly, skipping response_model
+# validation + jsonable_encoder (response_model stays for the OpenAPI docs).
+# Same fields, same order as schemas.BranchResponse / schemas.UserResponse.
+BRANCH_FIELDS = ("name", "location", "phone", "id", "owner_id", "is_active", "created_at")
+STAFF_FIELDS = ("username", "email", "phone", "role", "id", "is_active", "branch_id", "created_at")
+
+
+# Base path of the print-queue links returned to staff screens
+QUEUE_URL = "/api/v1/queue"
+
+
+def _as_dicts(rows, fields):
+    """[{field: row.field, ...}, ...] for JSON output."""
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def owner_branch_ids(
+    owner: AuthUser = Depends(require_owner),
+    db: Session = Depends(get_db)
+) -> frozenset:
+    """
+    Dependency: ids of the current owner's branches.
+    Cached across requests (app/cache.py), and resolved once per request.
+    """
+    return get_owner_branch_ids(db, owner.id)
+
+
+def _owns_branch(
+    db: Session, owner_id: int, branch_ids: frozenset, branch_id: int, verify: bool = False
+) -> bool:
+    """
+    Is branch_id one of the owner's branches? Answered from the cached ids;
+    a miss re-reads them once, in case the branch was created on another
+    worker after this one cached the set.
+    
+    A hit can be stale: a branch deleted on another worker stays in the
+    cached set for up to 30s. verify=True confirms a hit in the database -
+    use it when a client-supplied branch_id is about to be WRITTEN (staff
+    assignment). Ids taken from a staff row need no check: deleting a
+    branch unassigns its staff in the same transaction.
+    """
+    if branch_id in branch_ids:
+        if not verify or db.scalar(select(exists().where(
+            models.Branch.id == branch_id,
+            models.Branch.owner_id == owner_id
+        ))):
+            return True
+        invalidate_owner_branches(owner_id)  # Stale entry - drop it
+        return False
+    invalidate_owner_branches(owner_id)
+    return branch_id in get_owner_branch_ids(db, owner_id)
+
 
 # ────────────────────────────────────────────────────────────────────────────
 # OWNER MANAGEMENT ENDPOINTS (Manage Staff & Branches)
 # ────────────────────────────────────────────────────────────────────────────
 
 @router.get("/owner/dashboard", tags=["Owner Management"])
-async def get_owner_dashboard(
-    owner: models.User = Depends(require_owner),
+def get_owner_dashboard(
+    owner: AuthUser = Depends(require_owner),
     db: Session = Depends(get_db)
 ):
     """
     OWNER ONLY: Get dashboard summary with branches and staff count
     """
-    total_branches = db.query(models.Branch).filter(
-        models.Branch.owner_id == owner.id
-    ).count()
-    
-    total_staff = db.query(models.User).filter(
-        models.User.role == "STAFF",
-        models.User.branch_id.in_(
-            db.query(models.Branch.id).filter(models.Branch.owner_id == owner.id)
-        )
-    ).count()
-    
-    branches = db.query(models.Branch).filter(models.Branch.owner_id == owner.id).all()
+    # ONE round trip: each branch with its staff count (the Branch.staff_count
+    # column property - 0 for branches that have no staff yet).
+    # Both totals are then just sums over these rows.
+    branches = db.execute(
+        select(
+            models.Branch.id,
+            models.Branch.name,
+            models.Branch.location,
+            models.Branch.is_active,
+            models.Branch.staff_count
+        ).where(
+            models.Branch.owner_id == owner.id
+        ).order_by(models.Branch.id)
+    ).all()
     
-    return {
+    return ORJSONResponse({
         "owner_name": owner.username,
         "owner_email": owner.email,
-        "total_branches": total_branches,
-        "total_staff": total_staff,
-        "branches": [
-            {
-                "id": b.id,
-                "name": b.name,
-                "location": b.location,
-                "is_active": b.is_active
-            }
-            for b in branches
-        ]
-    }
+        "total_branches": len(branches),
+        "total_staff": sum(b.staff_count for b in branches),
+        "branches": _as_dicts(branches, ("id", "name", "location", "is_active"))
+    })
 
 
 @router.post("/branches/", response_model=schemas.BranchResponse, tags=["Owner Management"])
-async def create_branch(
+def create_branch(
     branch: schemas.BranchCreate,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
     db: Session = Depends(get_db)
 ):
     """
@@ -68,27 +131,31 @@ async def create_branch(
         owner_id=owner.id
     )
     db.add(new_branch)
+    # The INSERT ... RETURNING fills in id and created_at, and the session
+    # doesn't expire objects on commit - no refresh() SELECT afterwards
     db.commit()
-    db.refresh(new_branch)
-    return new_branch
+    invalidate_owner_branches(owner.id)
+    return PydanticResponse(schemas.BranchResponse.model_validate(new_branch))
 
 
 @router.get("/branches/", response_model=list[schemas.BranchResponse], tags=["Owner Management"])
-async def list_branches(
-    owner: models.User = Depends(require_owner),
+def list_branches(
+    owner: AuthUser = Depends(require_owner),
     db: Session = Depends(get_db)
 ):
     """
     OWNER ONLY: List all branches owned by this owner
     """
-    branches = db.query(models.Branch).filter(models.Branch.owner_id == owner.id).all()
-    return branches
+    branches = db.query(models.Branch).options(raiseload("*")).filter(
+        models.Branch.owner_id == owner.id
+    ).all()
+    return ORJSONResponse(_as_dicts(branches, BRANCH_FIELDS))
 
 
 @router.delete("/branches/{branch_id}/", tags=["Owner Management"])
-async def delete_branch(
+def delete_branch(
     branch_id: int,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
     db: Session = Depends(get_db)
 ):
     """
@@ -97,44 +164,60 @@ async def delete_branch(
     - Automatically reassigns all staff in the branch to unassigned (branch_id = NULL)
     - Deletes the branch record
     """
-    # Get the branch
-    branch = db.query(models.Branch).filter(
-        models.Branch.id == branch_id,
-        models.Branch.owner_id == owner.id
-    ).first()
+    # Get the branch name (also proves the branch exists and is ours)
+    branch_name = db.scalar(
+        select(models.Branch.name).where(
+            models.Branch.id == branch_id,
+            models.Branch.owner_id == owner.id
+        )
+    )
     
-    if not branch:
+    if branch_name is None:
         raise HTTPException(
             status_code=404,
             detail="Branch not found or you don't have permission to delete it"
         )
     
+    # Two plain DML statements, one commit. synchronize_session=False: no
+    # objects from these rows are in the session to keep in step
     # Reassign all staff in this branch to unassigned
-    db.query(models.User).filter(models.User.branch_id == branch_id).update(
-        {models.User.branch_id: None}
+    db.execute(
+        update(models.User).where(
+            models.User.branch_id == branch_id
+        ).values(branch_id=None).execution_options(synchronize_session=False)
     )
     
     # Delete the branch
-    db.delete(branch)
+    db.execute(
+        delete(models.Branch).where(
+            models.Branch.id == branch_id
+        ).execution_options(synchronize_session=False)
+    )
     db.commit()
+    invalidate_owner_branches(owner.id)
     
-    return {"message": f"Branch '{branch.name}' has been deleted successfully. All staff have been unassigned."}
+    return {"message": f"Branch '{branch_name}' has been deleted successfully. All staff have been unassigned."}
 
 
 @router.post("/staff/", response_model=schemas.UserResponse, tags=["Owner Management"])
-async def create_staff(
+def create_staff(
     staff: schemas.UserCreate,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     db: Session = Depends(get_db)
 ):
     """
     OWNER ONLY: Create a new staff member.
     Staff must be assigned to a branch by owner.
     """
-    # Check if user exists
-    existing = db.query(models.User).filter(models.User.username == staff.username).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Username already exists")
+    # If branch_id provided, validate ownership (before the slow hash below)
+    if staff.branch_id is not None:
+        owns_branch = _owns_branch(db, owner.id, branch_ids, staff.branch_id, verify=True)
+        if not owns_branch:
+            raise HTTPException(
+                status_code=403,
+                detail="You can only assign staff to your own branches"
+            )
     
     # Hash password securely (supports long passwords)
     password_hash = hash_password(staff.password)
@@ -144,32 +227,28 @@ async def create_staff(
         email=staff.email,
         phone=staff.phone,
         password_hash=password_hash,
-        role="STAFF"
+        role="STAFF",
+        branch_id=staff.branch_id
     )
-    # If branch_id provided, validate ownership and assign
-    if staff.branch_id is not None:
-        branch = db.query(models.Branch).filter(
-            models.Branch.id == staff.branch_id,
-            models.Branch.owner_id == owner.id
-        ).first()
-        if not branch:
-            raise HTTPException(
-                status_code=403,
-                detail="You can only assign staff to your own branches"
-            )
-        new_staff.branch_id = staff.branch_id
     db.add(new_staff)
-    db.commit()
-    db.refresh(new_staff)
+    # No "does this username exist?" SELECT first: the unique indexes on
+    # username and email reject duplicates in the INSERT itself - one round
+    # trip, and correct even when two owners pick the same name at once
+    try:
+        db.commit()  # INSERT ... RETURNING: id/created_at, no refresh() needed
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     
-    return new_staff
+    return PydanticResponse(schemas.UserResponse.model_validate(new_staff))
 
 
 @router.put("/staff/{staff_id}/", response_model=schemas.UserResponse, tags=["Owner Management"])
-async def update_staff(
+def update_staff(
     staff_id: int,
     payload: schemas.UserUpdate,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     db: Session = Depends(get_db)
 ):
     """
@@ -182,11 +261,8 @@ async def update_staff(
 
     # Update branch assignment if provided (validate ownership)
     if payload.branch_id is not None:
-        branch = db.query(models.Branch).filter(
-            models.Branch.id == payload.branch_id,
-            models.Branch.owner_id == owner.id
-        ).first()
-        if not branch:
+        owns_branch = _owns_branch(db, owner.id, branch_ids, payload.branch_id, verify=True)
+        if not owns_branch:
             raise HTTPException(status_code=403, detail="You can only assign staff to your own branches")
         staff.branch_id = payload.branch_id
 
@@ -194,25 +270,25 @@ async def update_staff(
     if payload.phone is not None:
         staff.phone = payload.phone
     if payload.email is not None:
-        # Ensure email uniqueness
-        existing_email = db.query(models.User).filter(
-            models.User.email == payload.email,
-            models.User.id != staff_id
-        ).first()
-        if existing_email:
-            raise HTTPException(status_code=400, detail="Email already in use")
         staff.email = payload.email
 
-    db.commit()
-    db.refresh(staff)
-    return staff
+    # Email uniqueness is enforced by the unique index in the UPDATE itself,
+    # like create_staff: no SELECT first, and no race with a concurrent edit
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email already in use")
+    invalidate_auth_user(staff_id)  # Cached login identity has the old email
+    return PydanticResponse(schemas.UserResponse.model_validate(staff))
 
 
 @router.put("/staff/{staff_id}/password", tags=["Owner Management"])
-async def update_staff_password(
+def update_staff_password(
     staff_id: int,
     payload: schemas.PasswordUpdate,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     db: Session = Depends(get_db)
 ):
     """
@@ -225,11 +301,8 @@ async def update_staff_password(
 
     # If staff belongs to a branch, verify ownership
     if staff.branch_id:
-        branch = db.query(models.Branch).filter(
-            models.Branch.id == staff.branch_id,
-            models.Branch.owner_id == owner.id
-        ).first()
-        if not branch:
+        owns_branch = _owns_branch(db, owner.id, branch_ids, staff.branch_id)
+        if not owns_branch:
             raise HTTPException(status_code=403, detail="You can only manage staff in your own branches")
 
     # Store hashed password
@@ -240,10 +313,10 @@ async def update_staff_password(
 
 
 @router.post("/staff/{staff_id}/assign-branch", tags=["Owner Management"])
-async def assign_staff_to_branch(
+def assign_staff_to_branch(
     staff_id: int,
     branch_id: int,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
     db: Session = Depends(get_db)
 ):
     """
@@ -267,8 +340,9 @@ async def assign_staff_to_branch(
 
 
 @router.get("/staff/", response_model=list[schemas.UserResponse], tags=["Owner Management"])
-async def list_staff(
-    owner: models.User = Depends(require_owner),
+def list_staff(
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     branch_id: int | None = None,
     db: Session = Depends(get_db)
 ):
@@ -278,47 +352,48 @@ async def list_staff(
     Query Parameters:
     - branch_id (optional): Filter staff by specific branch. If not provided, returns all staff.
     """
-    from sqlalchemy import or_
-    
-    # Get all branch IDs owned by this owner
-    owner_branch_ids = db.query(models.Branch.id).filter(
-        models.Branch.owner_id == owner.id
-    ).all()
-    branch_ids = [b[0] for b in owner_branch_ids]
+    # Staff JOINed to their branch, so "is it one of MY branches?" is
+    # answered inside the same query (no separate branch-id lookup).
+    # raiseload("*"): only User columns are used - a lazy load of
+    # User.branch / User.permissions per row would raise instead
+    query = db.query(models.User).options(raiseload("*"))
     
-    # Build filter conditions
-    filters = [
-        models.User.role == "STAFF",
-        or_(
-            models.User.branch_id.in_(branch_ids),
-            models.User.branch_id.is_(None)
+    if branch_id is None:
+        # All staff in my branches + unassigned staff (outer join: no branch)
+        query = query.outerjoin(
+            models.Branch, models.Branch.id == models.User.branch_id
+        ).filter(
+            models.User.role == "STAFF",
+            or_(
+                models.Branch.owner_id == owner.id,
+                models.User.branch_id.is_(None)
+            )
         )
-    ]
-    
-    # If branch_id filter is provided, ensure it belongs to this owner
-    if branch_id is not None:
-        if branch_id not in branch_ids:
+    else:
+        # A specific branch: it must be mine (only assigned staff, exclude unassigned)
+        owns_branch = _owns_branch(db, owner.id, branch_ids, branch_id)
+        if not owns_branch:
             raise HTTPException(
                 status_code=403, 
                 detail="You can only view staff in your own branches"
             )
-        # Filter by the specific branch (only assigned staff, exclude unassigned)
-        filters = [
+        query = query.filter(
             models.User.role == "STAFF",
             models.User.branch_id == branch_id
-        ]
+        )
     
     # Get staff
-    staff_list = db.query(models.User).filter(*filters).all()
+    staff_list = query.all()
     
-    return staff_list
+    return ORJSONResponse(_as_dicts(staff_list, STAFF_FIELDS))
 
 
 @router.post("/staff/{staff_id}/permissions/", tags=["Owner Management"])
-async def grant_permission(
+def grant_permission(
     staff_id: int,
     permission_name: str,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     db: Session = Depends(get_db)
 ):
     """
@@ -331,39 +406,35 @@ async def grant_permission(
     
     # Verify staff belongs to one of this owner's branches
     if staff.branch_id:
-        branch = db.query(models.Branch).filter(
-            models.Branch.id == staff.branch_id,
-            models.Branch.owner_id == owner.id
-        ).first()
-        if not branch:
+        owns_branch = _owns_branch(db, owner.id, branch_ids, staff.branch_id)
+        if not owns_branch:
             raise HTTPException(
                 status_code=403, 
                 detail="You can only manage staff in your own branches"
             )
     
-    # Check if permission already exists
-    existing_perm = db.query(models.Permission).filter(
-        models.Permission.user_id == staff_id,
-        models.Permission.permission_name == permission_name
-    ).first()
-    
-    if existing_perm:
-        return {"message": f"Permission '{permission_name}' already granted"}
-    
-    new_permission = models.Permission(
-        user_id=staff_id,
-        permission_name=permission_name
+    # Insert-if-missing in ONE statement (unique user_id + permission_name):
+    # no SELECT first, and two owners granting at once can't both insert.
+    # rowcount is 1 for a new grant, 0 when it already existed (portable:
+    # MySQL has no RETURNING).
+    stmt = dialect_insert(db, models.Permission).values(
+        user_id=staff_id, permission_name=permission_name
+    ).on_conflict_do_nothing(
+        index_elements=["user_id", "permission_name"]
     )
-    db.add(new_permission)
+    inserted = db.execute(stmt).rowcount
     db.commit()
     
+    if not inserted:
+        return {"message": f"Permission '{permission_name}' already granted"}
     return {"message": f"Permission '{permission_name}' granted to {staff.username}"}
 
 
 @router.delete("/staff/{staff_id}/", tags=["Owner Management"])
-async def delete_staff(
+def delete_staff(
     staff_id: int,
-    owner: models.User = Depends(require_owner),
+    owner: AuthUser = Depends(require_owner),
+    branch_ids: frozenset = Depends(owner_branch_ids),
     db: Session = Depends(get_db)
 ):
     """
@@ -372,10 +443,12 @@ async def delete_staff(
     - Deletes all associated permissions
     - Deletes the staff member record
     """
-    # Get the staff member
-    staff = db.query(models.User).filter(
-        models.User.id == staff_id,
-        models.User.role == "STAFF"
+    # Get the staff member (just the two columns the checks need)
+    staff = db.execute(
+        select(models.User.username, models.User.branch_id).where(
+            models.User.id == staff_id,
+            models.User.role == "STAFF"
+        )
     ).first()
     
     if not staff:
@@ -383,22 +456,28 @@ async def delete_staff(
     
     # If staff is assigned to a branch, verify ownership
     if staff.branch_id:
-        branch = db.query(models.Branch).filter(
-            models.Branch.id == staff.branch_id,
-            models.Branch.owner_id == owner.id
-        ).first()
-        if not branch:
+        owns_branch = _owns_branch(db, owner.id, branch_ids, staff.branch_id)
+        if not owns_branch:
             raise HTTPException(
                 status_code=403,
                 detail="You can only delete staff in your own branches"
             )
     
     # Delete associated permissions
-    db.query(models.Permission).filter(models.Permission.user_id == staff_id).delete()
+    db.execute(
+        delete(models.Permission).where(
+            models.Permission.user_id == staff_id
+        ).execution_options(synchronize_session=False)
+    )
     
     # Delete the staff member
-    db.delete(staff)
+    db.execute(
+        delete(models.User).where(
+            models.User.id == staff_id
+        ).execution_options(synchronize_session=False)
+    )
     db.commit()
+    invalidate_auth_user(staff_id)  # Their token must stop working here now
     
     return {"message": f"Staff member '{staff.username}' has been deleted successfully"}
 
@@ -407,62 +486,156 @@ async def delete_staff(
 # STAFF PRINT QUEUE ENDPOINTS (Existing)
 # ────────────────────────────────────────────────────────────────────────────
 
-@router.get("/queue/", tags=["Print Queue"])
-async def get_print_queue(
-    staff: models.User = Depends(require_staff),
-    db: Session = Depends(get_db)
-):
-    """STAFF ONLY: Get the print queue"""
-    # Return all jobs that are PENDING, with download/print links
-    jobs = db.query(models.PrintJob).filter(models.PrintJob.status == "PENDING").all()
-    base = "/api/v1/queue"
-    result = []
-    for j in jobs:
-        result.append({
+@cached(print_queue_cache, key=lambda db: hashkey("pending"), lock=print_queue_lock)
+def _pending_jobs_json(db: Session) -> bytes:
+    """
+    PENDING jobs with download/print links, as ready-encoded JSON bytes
+    (cached, see app/cache.py): repeat polls skip the query AND the encoding.
+    """
+    # Plain Row tuples of just these columns - no PrintJob objects built.
+    # Oldest first, read in order from ix_printjob_status_created.
+    jobs = db.query(
+        models.PrintJob.id,
+        models.PrintJob.job_code,
+        models.PrintJob.filename,
+        models.PrintJob.total_pages,
+        models.PrintJob.is_color,
+        models.PrintJob.status
+    ).filter(
+        models.PrintJob.status == "PENDING"
+    ).order_by(models.PrintJob.created_at).all()
+    return orjson.dumps([
+        {
             "id": j.id,
             "job_code": j.job_code,
             "filename": j.filename,
             "total_pages": j.total_pages,
             "is_color": j.is_color,
             "status": j.status,
-            "download_url": f"{base}/{j.job_code}/download/",
-            "print_url": f"{base}/{j.job_code}/print/"
-        })
-    return result
+            "download_url": f"{QUEUE_URL}/{j.job_code}/download/",
+            "print_url": f"{QUEUE_URL}/{j.job_code}/print/"
+        }
+        for j in jobs
+    ])
+
+
+@router.get("/queue/", tags=["Print Queue"])
+def get_print_queue(
+    staff: AuthUser = Depends(require_staff),
+    db: Session = Depends(get_db)
+):
+    """STAFF ONLY: Get the print queue"""
+    # Return all jobs that are PENDING, with download/print links
+    return Response(_pending_jobs_json(db), media_type="application/json")
 
 
 
 # Simple download endpoint for staff
 @router.get("/queue/{job_code}/download/", tags=["Print Queue"])
-async def download_print_job(
+def download_print_job(
     job_code: str,
-    staff: models.User = Depends(require_staff),
+    staff: AuthUser = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """STAFF ONLY: Download a print job file"""
-    job = db.query(models.PrintJob).filter(models.PrintJob.job_code == job_code).first()
+    job = db.execute(
+        select(models.PrintJob.file_path, models.PrintJob.filename).where(
+            models.PrintJob.job_code == job_code
+        )
+    ).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if not os.path.exists(job.file_path):
+    # ONE stat: it answers "does the file exist?" and is handed to
+    # FileResponse, which would otherwise stat the file again before sending it.
+    try:
+        file_stat = os.stat(job.file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(job.file_path, filename=job.filename)
+    return FileResponse(job.file_path, filename=job.filename, stat_result=file_stat)
+
+def _send_job_to_printer(job_id: int, file_path: str, printer_name: str, previous_status: str):
+    """
+    Second half of print_from_queue, run as a background task AFTER the
+    response is sent (in the threadpool), so the spooler round trip never
+    holds up the HTTP request.
+    
+    Opens its own session - the request's is closed by then.
+    Success: deduct paper/ink and mark the job PRINTED (COLLECTED stays COLLECTED).
+    Failure: log it and put the job back to the status it had before
+    (PENDING, PRINTED or a paid COLLECTED job) so it can be retried.
+    """
+    result = send_to_printer(file_path, printer_name)
+    
+    db = session_factory()
+    try:
+        job = db.get(models.PrintJob, job_id)
+        if job is None:
+            # Deleted while it was printing - nothing left to update
+            logger.warning("Print job %s was deleted while printing", job_id)
+            return
+        if result["status"] == "error":
+            logger.warning("Printing job %s failed: %s", job.job_code, result["message"])
+            job.status = previous_status
+        else:
+            deduct_stock_for_print(db, job.total_pages, job.is_color)
+            # A reprint of a paid job stays COLLECTED - PRINTED would put it
+            # back in the checkout list to be charged again
+            job.status = "COLLECTED" if previous_status == "COLLECTED" else "PRINTED"
+        db.commit()
+    finally:
+        db.close()
+    invalidate_print_queue()  # Back in the list after a failure
+
+
+# A PRINTING job normally leaves that status within LP_TIMEOUT_SECONDS.
+# One still PRINTING after this long was claimed by a worker that died or
+# restarted before _send_job_to_printer ran, so it may be claimed again.
+PRINT_CLAIM_TIMEOUT = timedelta(minutes=5)
+
 
 # Simplified print endpoint from queue (keeps single action per job)
-@router.post("/queue/{job_code}/print/", tags=["Print Queue"])
-async def print_from_queue(
+@router.post("/queue/{job_code}/print/", status_code=202, tags=["Print Queue"])
+def print_from_queue(
     job_code: str,
+    background_tasks: BackgroundTasks,
     printer_name: str = "Default",
-    staff: models.User = Depends(require_staff),
+    staff: AuthUser = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
-    """STAFF ONLY: Print a job from queue"""
-    job = db.query(models.PrintJob).filter(models.PrintJob.job_code == job_code).first()
+    """
+    STAFF ONLY: Print a job from queue
+    
+    Marks the job PRINTING and answers 202 Accepted straight away; the file
+    goes to the printer in the background (see _send_job_to_printer).
+    """
+    # FOR UPDATE: two staff pressing Print at once can't both claim the job
+    # (ignored on SQLite, which serialises writers anyway)
+    job = db.query(models.PrintJob).filter(
+        models.PrintJob.job_code == job_code
+    ).with_for_update().first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    result = send_to_printer(job.file_path, printer_name)
-    if result["status"] == "error":
-        raise HTTPException(status_code=500, detail=result["message"])
-    deduct_stock_for_print(db, job.total_pages, job.is_color)
-    job.status = "PRINTED"
+    
+    now = datetime.now(timezone.utc)
+    previous_status = job.status  # Restored if the printer fails
+    if job.status == "PRINTING":
+        started = job.printing_started_at
+        if started is not None and started.tzinfo is None:
+            started = started.replace(tzinfo=timezone.utc)  # SQLite drops the zone
+        if started is not None and now - started < PRINT_CLAIM_TIMEOUT:
+            raise HTTPException(status_code=409, detail="Job is already printing")
+        # Stale claim: the status before it is unknown, so a failed
+        # retry leaves the job PENDING (back in the queue)
+        logger.warning("Reclaiming job %s, stuck in PRINTING since %s", job_code, started)
+        previous_status = "PENDING"
+    
+    job_id, file_path, pages = job.id, job.file_path, job.total_pages
+    job.status = "PRINTING"
+    job.printing_started_at = now
     db.commit()
-    return {"message": "Printing started", "pages_deducted": job.total_pages}
\ No newline at end of file
+    invalidate_print_queue()  # Job left the PENDING list
+    
+    background_tasks.add_task(
+        _send_job_to_printer, job_id, file_path, printer_name, previous_status
+    )
+    return {"message": "Printing started", "job_code": job_code, "status": "PRINTING", "pages": pages}
\ No newline at end of file
@@ -8,13 +8,18 @@
 """
 
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import models
 from app.services.file_analysis import analyze_pdf
+from app.cache import invalidate_print_queue
+from app.utils.security import sanitize_filename, validate_file_extension, validate_file_size, MAX_FILE_SIZE
+import asyncio
+import errno
 import shutil
 import os
-import random
+import uuid
 
 # ────────────────────────────────────────────────────────────────────────────
 # CREATE A ROUTER INSTANCE
@@ -28,6 +33,33 @@ router = APIRouter()
 UPLOAD_DIR = "static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)  # Create folder if it doesn't exist
 
+# Copy uploads in 1 MiB chunks (copyfileobj's default is 64 KiB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _save_upload(src, file_location: str, size: int | None = None):
+    """
+    Copy the uploaded (spooled) file to disk, chunk by chunk.
+    Blocking file I/O - call it via run_in_threadpool from async code.
+
+    On Linux the full size is reserved up front (posix_fallocate), so the
+    filesystem allocates one contiguous extent instead of growing the file
+    block by block on every write. On filesystems without native fallocate
+    (e.g. NFSv3) glibc emulates it by writing every block first - slower,
+    but not an error.
+    """
+    with open(file_location, "wb") as buffer:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(buffer.fileno(), 0, size)
+            except OSError as e:
+                # Only "not supported" is harmless; anything else (ENOSPC,
+                # EIO, ...) fails the upload like a failed write would
+                if e.errno != errno.EOPNOTSUPP:
+                    raise
+        shutil.copyfileobj(src, buffer, UPLOAD_CHUNK_SIZE)
+        buffer.truncate()  # Never keep preallocated bytes past the real end
+
 # ────────────────────────────────────────────────────────────────────────────
 # ENDPOINT 1: FILE UPLOAD
 # ────────────────────────────────────────────────────────────────────────────
@@ -35,7 +67,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)  # Create folder if it doesn't exist
 @router.post("/upload/")
 async def upload_document(
     file: UploadFile = File(...),  # Required file parameter
-    db: Session = Depends(get_db)  # Dependency injection for database
+    db: AsyncSession = Depends(get_async_db)  # Dependency injection for database
 ):
     """
     FILE UPLOAD ENDPOINT
@@ -44,11 +76,11 @@ async def upload_document(
     URL: /api/v1/upload/  (prefix from main.py)
     
     What happens:
-    1. Generate unique 4-digit code (#XXXX)
-    2. Save file to disk
-    3. Analyze file (count pages)
-    4. Store info in database
-    5. Return job code to customer
+    0. Validate file type and size (415 / 413 / 400)
+    1. Save file to disk
+    2. Analyze file (count pages)
+    3. Store info in database (the job code comes from the new row's id)
+    4. Return job code to customer
     
     PARAMETERS:
     -----------
@@ -56,9 +88,11 @@ async def upload_document(
         The file uploaded by customer
         File(...) means this parameter is REQUIRED
     
-    db : Session
-        Database session (injected via Depends)
-        FastAPI automatically calls get_db() and passes the session
+    db : AsyncSession
+        Async database session (injected via Depends)
+        FastAPI automatically calls get_async_db() and passes the session.
+        This endpoint is `async def`, so a sync Session here would block
+        the event loop (every other request) while it talks to the database
     
     RETURN:
     -------
@@ -69,59 +103,101 @@ async def upload_document(
     ├─ async = Handle multiple uploads concurrently
     ├─ UploadFile = Special FastAPI class for file uploads
     ├─ File(...) = File parameter (required)
-    └─ Depends(get_db) = Dependency injection pattern
+    └─ Depends(get_async_db) = Dependency injection pattern
     """
+    # ────────────────────────────────────────────────────────────────────────
+    # STEP 0: Validate BEFORE touching the disk
+    # ────────────────────────────────────────────────────────────────────────
+    # The request body is already spooled, so its size is known up front:
+    # a rejected upload costs no disk write at all
+    if not validate_file_extension(file.filename or ""):
+        raise HTTPException(status_code=415, detail="File type not allowed")
+    
+    size = file.size
+    if size is None:
+        size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(0)
+    if not validate_file_size(size):
+        raise HTTPException(
+            status_code=413 if size else 400,
+            detail=f"File exceeds {MAX_FILE_SIZE // (1024 * 1024)} MB" if size else "File is empty"
+        )
+    
+    # Where the file currently is on disk (removed again if the upload fails)
+    file_location = None
     try:
         # ────────────────────────────────────────────────────────────────────
-        # STEP 1: Generate Unique Job Code
-        # ────────────────────────────────────────────────────────────────────
-        # This is the code the customer shows at the counter
-        # Example: #4492
-        job_code = str(random.randint(1000, 9999))
-         
-        # ────────────────────────────────────────────────────────────────────
-        # STEP 2: Save File to Disk
+        # STEP 1: Save File to Disk
         # ────────────────────────────────────────────────────────────────────
-        # The file is saved in static/uploads/ with the job code prefix
-        # Example: static/uploads/4492_document.pdf
-        file_location = f"{UPLOAD_DIR}/{job_code}_{file.filename}"
+        # The job code isn't known yet (STEP 3), so the file is written under
+        # a unique temporary name first and renamed once the job row exists
+        file_location = f"{UPLOAD_DIR}/.upload_{uuid.uuid4().hex}"
         
-        with open(file_location, "wb") as buffer:
-            # Read file in chunks and write to disk
-            # This is memory-efficient for large files
-            shutil.copyfileobj(file.file, buffer)
+        # Read file in chunks and write to disk (memory-efficient for large
+        # files). The copy is blocking file I/O, so it runs in the threadpool:
+        # on the event loop it would stall every other request meanwhile.
+        await run_in_threadpool(_save_upload, file.file, file_location, size)
         
         # ────────────────────────────────────────────────────────────────────
-        # STEP 3: Analyze the File
+        # STEP 2: Analyze the File
         # ────────────────────────────────────────────────────────────────────
         # Count pages, detect colors, etc.
         # This is a service function (see services/file_analysis.py)
-        analysis = analyze_pdf(file_location)
+        # It reads the upload's own buffer (in memory for small files), not
+        # the copy just written - one pass over the bytes on disk, not two.
+        # Parsing is CPU work, so it runs in the threadpool - and STARTS here
+        # without waiting: the INSERT below runs while the PDF is parsed.
+        analysis_task = asyncio.create_task(
+            run_in_threadpool(analyze_pdf, file_location, stream=file.file)
+        )
         
         # ────────────────────────────────────────────────────────────────────
-        # STEP 4: Save to Database
+        # STEP 3: Save to Database
         # ────────────────────────────────────────────────────────────────────
         # Create a new PrintJob record in the database
         # This is an ORM operation (SQLAlchemy)
         new_job = models.PrintJob(
-            job_code=job_code,
             filename=file.filename,
-            file_path=file_location,
-            total_pages=analysis["pages"],
             status="PENDING"  # Job is waiting to be printed
         )
         
         # Add to session (staging area)
         db.add(new_job)
         
-        # Commit = actually write to database
-        db.commit()
+        # Flush = send the INSERT now (RETURNING gives us the new id)
+        try:
+            await db.flush()
+        finally:
+            # Page count from STEP 2 (always collected, even if the INSERT
+            # failed, so the parse never outlives the request)
+            analysis = await analysis_task
+        new_job.total_pages = analysis["pages"]
+        
+        # This is the code the customer shows at the counter.
+        # Derived from the id, so it is unique by construction - no random
+        # numbers that collide with the unique index as the table fills up.
+        # At least 5 digits: older jobs hold random 4-digit codes (1000-9999),
+        # and a 5-character code can never equal one of them. Not id % 10000 -
+        # wrapped codes would hit the unique index again after 10000 jobs;
+        # the code simply grows a digit instead (job 123456 -> #123456).
+        # Example: #00042
+        new_job.job_code = f"{new_job.id:05d}"
+        
+        # The file is stored in static/uploads/ with the job code prefix
+        # Example: static/uploads/00042_document.pdf
+        new_job.file_path = f"{UPLOAD_DIR}/{new_job.job_code}_{sanitize_filename(file.filename)}"
+        os.replace(file_location, new_job.file_path)  # Same directory: a cheap rename
+        file_location = new_job.file_path
         
-        # Refresh = get the updated object from DB (gets auto-generated ID)
-        db.refresh(new_job)
+        # Commit = actually write to database (awaited: the event loop
+        # serves other requests while the INSERT is in flight)
+        # (no db.refresh() afterwards: the session keeps objects loaded
+        # after commit, and everything returned below was set right here)
+        await db.commit()
+        invalidate_print_queue()  # Staff screens should see the new job now
         
         # ────────────────────────────────────────────────────────────────────
-        # STEP 5: Return Response
+        # STEP 4: Return Response
         # ────────────────────────────────────────────────────────────────────
         # FastAPI automatically converts dict to JSON
         return {
@@ -133,6 +209,9 @@ async def upload_document(
     
     except Exception as e:
         # If something goes wrong, return an error
+        # (and don't leave an orphaned file behind)
+        if file_location and os.path.exists(file_location):
+            os.remove(file_location)
         raise HTTPException(
             status_code=400,
             detail=f"Upload failed: {str(e)}"
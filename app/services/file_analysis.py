@@ -8,11 +8,48 @@
 ╚════════════════════════════════════════════════════════════════════════════╝
 """
 
+import hashlib
+import os
+import threading
+import time
 import pypdf
 from pathlib import Path
+from cachetools import LRUCache
 
+# ────────────────────────────────────────────────────────────────────────────
+# PAGE COUNT MEMO
+# ────────────────────────────────────────────────────────────────────────────
+# The same documents get uploaded again and again (forms, price lists,
+# the "print it once more" customer). Page counts are remembered per
+# CONTENT, not per path: key = (file size, sha256 of the first + last 64 KB).
+# The tail of a PDF holds the xref table and trailer (/ID, offsets), so any
+# real edit changes the key.
+#
+# Only parses slower than PDF_MEMO_MIN_SECONDS are stored: small PDFs are
+# cheaper to re-parse than to evict a big one for, which keeps the 512
+# slots for the documents where a hit actually saves time.
 
-def analyze_pdf(file_path: str):
+PDF_MEMO_EDGE_BYTES = 64 * 1024
+PDF_MEMO_MIN_SECONDS = 0.010
+
+_page_count_memo = LRUCache(maxsize=512)
+_page_count_lock = threading.Lock()
+
+
+def _content_key(f) -> tuple:
+    """(size, sha256 of head + tail) of an open binary file."""
+    # seek/tell rather than fstat: an in-memory upload buffer has no fd
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    digest = hashlib.sha256(f.read(PDF_MEMO_EDGE_BYTES))
+    if size > 2 * PDF_MEMO_EDGE_BYTES:
+        f.seek(-PDF_MEMO_EDGE_BYTES, os.SEEK_END)
+    digest.update(f.read())
+    f.seek(0)
+    return size, digest.hexdigest()
+
+
+def analyze_pdf(file_path: str, stream=None):
     """
     Analyze a PDF file and extract information.
     
@@ -26,6 +63,11 @@ def analyze_pdf(file_path: str):
     file_path : str
         Path to the PDF file (e.g., "static/uploads/4492_resume.pdf")
     
+    stream : binary file object, optional
+        The same bytes, already open - e.g. the upload's own buffer right
+        after it was saved to file_path. Read instead of opening file_path
+        again, so a fresh upload isn't read back from disk.
+    
     RETURN:
     -------
     dict with keys:
@@ -47,11 +89,13 @@ def analyze_pdf(file_path: str):
     """
     try:
         # Open the PDF file
-        reader = pypdf.PdfReader(file_path)
-        
-        # Count pages
-        # PdfReader.pages is a list of page objects
-        num_pages = len(reader.pages)
+        # Passing an open file (not the path) keeps pypdf from reading the
+        # whole document into memory first - it only seeks to what it needs
+        if stream is not None:
+            num_pages = _count_pages(stream)
+        else:
+            with open(file_path, "rb") as f:
+                num_pages = _count_pages(f)
         
         # For now, assume all documents are B&W
         # (Color detection requires analyzing each page - complex!)
@@ -71,4 +115,42 @@ def analyze_pdf(file_path: str):
             "pages": 0,
             "status": "error",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+
+def _count_pages(f) -> int:
+    """Page count of an open PDF file, through the page count memo."""
+    # Seen this exact document before? (see PAGE COUNT MEMO)
+    key = _content_key(f)
+    with _page_count_lock:
+        num_pages = _page_count_memo.get(key)
+    
+    if num_pages is None:
+        started = time.perf_counter()
+        reader = pypdf.PdfReader(f, strict=False)
+        
+        # Count pages
+        num_pages = _page_count(reader)
+        
+        if time.perf_counter() - started > PDF_MEMO_MIN_SECONDS:
+            with _page_count_lock:
+                _page_count_memo[key] = num_pages
+    return num_pages
+
+
+def _page_count(reader: pypdf.PdfReader) -> int:
+    """
+    Page count from the /Count entry of the root /Pages node.
+
+    len(reader.pages) walks and flattens the whole page tree (one object
+    per page); /Count is a single integer next to the catalog. Falls back
+    to the full walk when /Count is missing or nonsense (broken files).
+    """
+    try:
+        count = reader.trailer["/Root"].get_object()["/Pages"].get_object()["/Count"]
+        count = int(count)
+        if count >= 0:
+            return count
+    except (KeyError, TypeError, ValueError, AttributeError):
+        pass
+    return len(reader.pages)
\ No newline at end of file
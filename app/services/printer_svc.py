@@ -2,10 +2,18 @@ import os
 import platform
 import subprocess
 
+# `lp` normally returns as soon as CUPS has queued the job; a hung spooler
+# must not hold a threadpool worker forever (the job goes back to the status
+# it had before printing: PENDING, PRINTED or COLLECTED)
+LP_TIMEOUT_SECONDS = 30
+
 
 def send_to_printer(file_path: str, printer_name: str = None):
     """
     Sends a file directly to the OS print queue.
+    
+    Blocking: call it from the threadpool (see _send_job_to_printer in
+    app/routers/staff.py, a background task), never on the event loop.
     """
     system_name = platform.system()
     
@@ -28,7 +36,7 @@ def send_to_printer(file_path: str, printer_name: str = None):
                 command.extend(["-d", printer_name])
             command.append(file_path)
             
-            subprocess.run(command, check=True)
+            subprocess.run(command, check=True, timeout=LP_TIMEOUT_SECONDS)
             
         return {"status": "success", "message": "Sent to print queue"}
 
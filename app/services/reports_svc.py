@@ -0,0 +1,95 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app import models
+from app.database import dialect_insert
+
+def record_sale(db: Session, amount: float):
+    """
+    Add one sale to today's DailyRevenue row (created on the first sale of the day).
+    Call inside the checkout transaction, before commit, so the rollup and
+    the order are saved - or rolled back - together.
+
+    The day comes from the database clock (CURRENT_DATE), the same clock that
+    stamps orders.created_at, so the two always agree on "today".
+    """
+    stmt = dialect_insert(db, models.DailyRevenue).values(
+        day=func.current_date(), revenue=amount
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={"revenue": models.DailyRevenue.revenue + stmt.excluded.revenue}
+    )
+    db.execute(stmt)
+
+
+def record_product_sales(db: Session, items: list[dict]):
+    """
+    Add the RETAIL lines of one order to the ProductSales running totals.
+    `items` are the order item dicts (product_name, quantity, unit_price, item_type).
+    Call inside the checkout transaction, like record_sale().
+    """
+    # One row per product: the same product twice in a cart must not hit
+    # ON CONFLICT twice within a single (batched) statement
+    totals = {}
+    for item in items:
+        if item["item_type"] != "RETAIL":
+            continue
+        qty, revenue = totals.get(item["product_name"], (0, 0.0))
+        totals[item["product_name"]] = (
+            qty + item["quantity"],
+            revenue + item["quantity"] * item["unit_price"]
+        )
+    if not totals:
+        return
+
+    stmt = dialect_insert(db, models.ProductSales)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_name"],
+        set_={
+            "qty_sold": models.ProductSales.qty_sold + stmt.excluded.qty_sold,
+            "revenue": models.ProductSales.revenue + stmt.excluded.revenue
+        }
+    )
+    db.execute(stmt, [
+        {"product_name": name, "qty_sold": qty, "revenue": revenue}
+        for name, (qty, revenue) in totals.items()
+    ])
+
+
+def rebuild_daily_revenue(db: Session):
+    """
+    Recompute the whole DailyRevenue table from orders.
+    Needed once after the table is added (existing orders), or to repair it.
+    """
+    db.query(models.DailyRevenue).delete()
+    db.execute(
+        models.DailyRevenue.__table__.insert().from_select(
+            ["day", "revenue"],
+            select(
+                func.date(models.Order.created_at),
+                func.sum(models.Order.total_amount)
+            ).group_by(func.date(models.Order.created_at))
+        )
+    )
+    db.commit()
+
+
+def rebuild_product_sales(db: Session):
+    """
+    Recompute the whole ProductSales table from RETAIL order items.
+    Needed once after the table is added (existing orders), or to repair it.
+    """
+    db.query(models.ProductSales).delete()
+    db.execute(
+        models.ProductSales.__table__.insert().from_select(
+            ["product_name", "qty_sold", "revenue"],
+            select(
+                models.OrderItem.product_name,
+                func.sum(models.OrderItem.quantity),
+                func.sum(models.OrderItem.quantity * models.OrderItem.unit_price)
+            ).where(
+                models.OrderItem.item_type == "RETAIL"
+            ).group_by(models.OrderItem.product_name)
+        )
+    )
+    db.commit()
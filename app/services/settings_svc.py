@@ -1,17 +1,34 @@
 from sqlalchemy.orm import Session
-from app import models
+from app.cache import get_setting, get_settings
 
 def get_dynamic_price(db: Session, key: str, default: float):
     """
     Fetches a dynamic price (or any setting) from the SystemSettings table.
     If the setting is not found, returns a default value.
+    Reads go through the settings cache (app/cache.py).
     """
-    setting = db.query(models.SystemSetting).filter(models.SystemSetting.key == key).first()
-    if setting:
+    return _to_price(key, get_setting(db, key), default)
+
+
+def get_dynamic_prices(db: Session, defaults: dict[str, float]) -> dict[str, float]:
+    """
+    Several prices at once: {key: default} in, {key: price} out.
+    Keys that are not cached yet are fetched together in ONE query.
+    
+    Example:
+        prices = get_dynamic_prices(db, {"price_color_a4": 0.50, "price_bw_a4": 0.10})
+    """
+    values = get_settings(db, list(defaults))
+    return {key: _to_price(key, values[key], default) for key, default in defaults.items()}
+
+
+def _to_price(key: str, value, default: float) -> float:
+    """Parse a stored setting as a float, falling back to `default`."""
+    if value is not None:
         try:
-            return float(setting.value)
+            return float(value)
         except ValueError:
             # Handle cases where value in DB is not a valid float
-            print(f"Warning: SystemSetting key '{key}' has non-float value: {setting.value}. Using default: {default}")
+            print(f"Warning: SystemSetting key '{key}' has non-float value: {value}. Using default: {default}")
             return default
     return default
@@ -1,29 +1,80 @@
 from pysnmp.hlapi.v3arch.asyncio import get_cmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
 import asyncio
+import logging
+import os
 
 # Standard OID for "Total Marker Count" (Pages Printed)
 OID_TOTAL_PAGES = '1.3.6.1.2.1.43.10.2.1.4.1.1'
 
+# Polled by the watchdog, so errors go to its (queued, non-blocking) logger
+logger = logging.getLogger("watchdog")
+
+# Cap on SNMP requests in flight at once (the watchdog polls all printers
+# concurrently; small print-server firmware drops bursts of requests).
+# All requests share ONE UDP socket (the shared engine's transport below),
+# so a large fleet costs no extra sockets or ephemeral ports - this only
+# limits how bursty a poll cycle is. Tune via SNMP_MAX_CONCURRENCY.
+SNMP_CONCURRENCY = asyncio.Semaphore(int(os.getenv("SNMP_MAX_CONCURRENCY", "20")))
+
+# One SnmpEngine for every poll (like a DB connection pool): building one
+# sets up a dispatcher, transports and the MIB builder, which the watchdog
+# used to do for every printer every minute. Created lazily, inside the
+# running event loop, and closed on app shutdown (close_snmp_engine).
+_engine = None
+
+# ip -> UdpTransportTarget (address already resolved)
+_targets = {}
+
+
+def _get_engine() -> SnmpEngine:
+    global _engine
+    if _engine is None:
+        _engine = SnmpEngine()
+    return _engine
+
+
+async def _get_target(ip_address: str) -> UdpTransportTarget:
+    target = _targets.get(ip_address)
+    if target is None:
+        target = await UdpTransportTarget.create((ip_address, 161), retries=1)
+        _targets[ip_address] = target
+    return target
+
+
+def close_snmp_engine():
+    """Release the shared SnmpEngine's sockets (call on app shutdown)."""
+    global _engine
+    if _engine is not None:
+        _engine.close_dispatcher()
+        _engine = None
+    _targets.clear()
+
 async def fetch_printer_counter(ip_address: str):
     """
     Talks to the printer over LAN and gets the total page count.
     """
+    async with SNMP_CONCURRENCY:
+        return await _fetch_printer_counter(ip_address)
+
+
+async def _fetch_printer_counter(ip_address: str):
     try:
-        iterator = get_cmd(
-            SnmpEngine(),
+        # pysnmp's asyncio API: get_cmd() and the transport setup (address
+        # resolution) are coroutines - awaiting them lets the event loop
+        # serve requests and poll other printers while this one answers
+        errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
+            _get_engine(),
             CommunityData('public', mpModel=0), # 'public' is default password for printers
-            UdpTransportTarget().create((ip_address, 161), retries=1),
+            await _get_target(ip_address),
             ContextData(),
             ObjectType(ObjectIdentity(OID_TOTAL_PAGES))
-        ) 
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
+        )
 
         if errorIndication:
-            print(f"SNMP Error: {errorIndication}")
+            logger.warning("SNMP error from %s: %s", ip_address, errorIndication)
             return None
         elif errorStatus:
-            print(f"SNMP Error Status: {errorStatus.prettyPrint()}")
+            logger.warning("SNMP error status from %s: %s", ip_address, errorStatus.prettyPrint())
             return None
         else:
             # Success! Return the integer value
@@ -31,5 +82,5 @@ async def fetch_printer_counter(ip_address: str):
             return counter_value
 
     except Exception as e:
-        print(f"Connection Error to {ip_address}: {e}")
+        logger.warning("Connection error to %s: %s", ip_address, e)
         return None
\ No newline at end of file
@@ -6,44 +6,20 @@ def deduct_stock_for_print(db: Session, pages: int, is_color: bool):
     The 'Recipe' Logic:
     1. Find 'A4 Paper' -> Deduct X sheets.
     2. Find 'Ink' -> Deduct Y percent.
-    """
-    
-    # 1. Deduct Paper (Assuming 1 page = 1 sheet for simplicity)
-    # In real life, handle double-sided logic here (pages / 2)
-    paper_stock = db.query(models.RawMaterial).filter(models.RawMaterial.type == "PAPER").first()
-    
-    if paper_stock:
-        # Check if we have enough
-        if paper_stock.current_level >= pages:
-            paper_stock.current_level -= pages
-            print(f"Deducted {pages} sheets. Remaining: {paper_stock.current_level}")
-        else:
-            print("ALERT: Low Paper Stock!")
-    
-    # 2. Deduct Ink (Estimation)
-    # Assume 1 page uses 0.05 units of Ink
-    ink_stock = db.query(models.RawMaterial).filter(models.RawMaterial.type == "INK").first()
-    
-    if ink_stock:
-        usage = pages * 0.05 # 5% coverage
-        ink_stock.current_level -= usage
     
-    db.commit()
-    return True
-
-from sqlalchemy.orm import Session
-from app import models
-
-def deduct_stock_for_print(db: Session, pages: int, is_color: bool):
-    """
-    The 'Recipe' Logic:
-    1. Find 'A4 Paper' -> Deduct X sheets.
-    2. Find 'Ink' -> Deduct Y percent.
+    Changes are left pending in `db`; the caller must commit.
     """
     
+    # Paper AND ink in one round trip; keep the first row of each type
+    stock = {}
+    for material in db.query(models.RawMaterial).filter(
+        models.RawMaterial.type.in_(("PAPER", "INK"))
+    ).order_by(models.RawMaterial.id):
+        stock.setdefault(material.type, material)
+    
     # 1. Deduct Paper (Assuming 1 page = 1 sheet for simplicity)
     # In real life, handle double-sided logic here (pages / 2)
-    paper_stock = db.query(models.RawMaterial).filter(models.RawMaterial.type == "PAPER").first()
+    paper_stock = stock.get("PAPER")
     
     if paper_stock:
         # Check if we have enough
@@ -55,13 +31,14 @@ def deduct_stock_for_print(db: Session, pages: int, is_color: bool):
     
     # 2. Deduct Ink (Estimation)
     # Assume 1 page uses 0.05 units of Ink
-    ink_stock = db.query(models.RawMaterial).filter(models.RawMaterial.type == "INK").first()
+    ink_stock = stock.get("INK")
     
     if ink_stock:
         usage = pages * 0.05 # 5% coverage
         ink_stock.current_level -= usage
     
-    db.commit()
+    # No commit here: the caller commits, so the deduction is saved (or
+    # rolled back) together with the sale / print that caused it
     return True
 
 # New function:
@@ -70,6 +47,8 @@ def deduct_stock_dynamic(db: Session, service_type: str, count: int):
     Looks up the Recipe table to find what to deduct.
     """
     # 1. Find all rules for this service (e.g., "PRINT_COLOR_A4")
+    # Each rule's material comes in the same SELECT (ProductionRecipe.material
+    # is lazy="joined") - no extra query per rule below
     rules = db.query(models.ProductionRecipe).filter(models.ProductionRecipe.service_type == service_type).all()
     
     results = []
@@ -79,7 +58,7 @@ def deduct_stock_dynamic(db: Session, service_type: str, count: int):
         total_deduction = rule.quantity_required * count
         
         # Deduct from Raw Material
-        material = db.query(models.RawMaterial).filter(models.RawMaterial.id == rule.raw_material_id).first()
+        material = rule.material
         
         if material:
             material.current_level -= total_deduction
@@ -1,8 +1,12 @@
 import asyncio
-from app.database import SessionLocal
+import logging
+from sqlalchemy import select, update, lambda_stmt
+from app.database import AsyncSessionLocal
 from app import models
 from app.services.snmp_svc import fetch_printer_counter
 
+logger = logging.getLogger("watchdog")
+
 # Single global task holder for the watchdog
 watchdog_task = None
 
@@ -13,36 +17,52 @@ async def run_snmp_watchdog():
     Runs until cancelled.
     """
     while True:
-        db = SessionLocal()
-        try:
-            printers = db.query(models.Printer).all()
-            for printer in printers:
-                print(f" [WATCHDOG] Checking printer: {printer.name} ({printer.ip_address})")
-                count = await fetch_printer_counter(printer.ip_address)
-                if count is not None:
-                    if count > printer.total_page_counter:
-                        pages_printed = count - printer.total_page_counter
-                        printer.total_page_counter = count
-                        db.add(printer)
-                        db.commit()
-                        db.refresh(printer)
+        async with AsyncSessionLocal() as db:
+            try:
+                # lambda_stmt: compiled once, then cached by code location
+                result = await db.execute(lambda_stmt(lambda: select(models.Printer)))
+                printers = result.scalars().all()
+                for printer in printers:
+                    logger.info("Checking printer: %s (%s)", printer.name, printer.ip_address)
+
+                # Poll all printers at once: cycle time = slowest printer,
+                # not the sum of every printer's SNMP round trip
+                # (return_exceptions: one failing printer can't abort the rest)
+                counts = await asyncio.gather(
+                    *(fetch_printer_counter(p.ip_address) for p in printers),
+                    return_exceptions=True
+                )
 
-                        log_entry = models.PrinterLog(
-                            printer_id=printer.id,
-                            page_count=count,
-                            notes=f"Pages printed: {pages_printed} | Total: {count}"
-                        )
-                        db.add(log_entry)
-                        db.commit()
-                        print(f" [WATCHDOG] Printer {printer.name} Total Count Updated: {count}")
+                # Collect the changes first, write them in one batch below
+                counters = []
+                for printer, count in zip(printers, counts):
+                    if isinstance(count, Exception):
+                        count = None
+                    if count is not None:
+                        if count > printer.total_page_counter:
+                            pages_printed = count - printer.total_page_counter
+                            counters.append({"id": printer.id, "total_page_counter": count})
+
+                            log_entry = models.PrinterLog(
+                                printer_id=printer.id,
+                                page_count=count,
+                                notes=f"Pages printed: {pages_printed} | Total: {count}"
+                            )
+                            db.add(log_entry)
+                            logger.info("Printer %s Total Count Updated: %s", printer.name, count)
+                        else:
+                            logger.info("Printer %s Total Count (no change): %s", printer.name, count)
                     else:
-                        print(f" [WATCHDOG] Printer {printer.name} Total Count (no change): {count}")
-                else:
-                    print(f" [WATCHDOG] Failed to fetch counter for {printer.name} ({printer.ip_address})")
-        except Exception as e:
-            print(f" [WATCHDOG ERROR] {e}")
-        finally:
-            db.close()
+                        logger.warning("Failed to fetch counter for %s (%s)", printer.name, printer.ip_address)
+
+                # ORM bulk UPDATE by primary key: one executemany for every
+                # changed printer; the new logs go out as one multi-row INSERT
+                # at commit. One transaction for the whole cycle.
+                if counters:
+                    await db.execute(update(models.Printer), counters)
+                await db.commit()
+            except Exception:
+                logger.exception("Watchdog cycle failed")
 
         await asyncio.sleep(60)
 
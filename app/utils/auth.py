@@ -4,9 +4,12 @@ Handles role-based access control (RBAC)
 """
 
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
+from cachetools import TTLCache
 from passlib.hash import pbkdf2_sha256
 
 import jwt
@@ -15,6 +18,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app import models
+from app.cache import AuthUser, get_auth_user
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
 ALGORITHM = "HS256"
@@ -24,16 +28,33 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "720"
 # ────────────────────────────────────────────────────────────────────────────
 # PASSWORD HELPERS
 # ────────────────────────────────────────────────────────────────────────────
+# Hashing cost (PBKDF2 iterations) comes from PASSWORD_HASH_ROUNDS, so
+# production can raise it and dev/test can lower it without a code change.
+# Each hash stores its own round count, so changing the setting never
+# breaks verification of existing passwords.
+#
+# Hashing is CPU-bound on purpose: call these from plain `def` endpoints
+# (FastAPI's threadpool) or via run_in_threadpool from `async def` ones.
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", str(pbkdf2_sha256.default_rounds)))
+_hasher = pbkdf2_sha256.using(rounds=PASSWORD_HASH_ROUNDS)
+
 
 def hash_password(password: str) -> str:
     pwd = password or ""
     # pbkdf2_sha256 avoids bcrypt 72-byte limits and has wide support
-    return pbkdf2_sha256.hash(pwd)
+    return _hasher.hash(pwd)
 
 
 def verify_password(password: str, hashed: str) -> bool:
     pwd = password or ""
-    return pbkdf2_sha256.verify(pwd, hashed)
+    return _hasher.verify(pwd, hashed)
+
+
+# Hash of a random throwaway password, computed once at import. Login
+# verifies against it when the username doesn't exist, so that path does
+# the same hashing work as a wrong password.
+DUMMY_HASH = hash_password(os.urandom(16).hex())
 
 # ────────────────────────────────────────────────────────────────────────────
 # TOKEN HELPERS
@@ -47,17 +68,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+# Verified payloads by token string. Clients send the same token on every
+# request, so the signature check runs once per token per 30s instead of
+# once per request. Expiry is still checked on every hit.
+_token_cache = TTLCache(maxsize=4096, ttl=30)
+_token_lock = threading.Lock()
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its payload (raises jwt.PyJWTError if invalid)."""
+    with _token_lock:
+        payload = _token_cache.get(token)
+    if payload is not None:
+        if payload.get("exp", float("inf")) > time.time():
+            return payload
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    with _token_lock:
+        _token_cache[token] = payload
+    return payload
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # ROLE-BASED DEPENDENCIES
 # ────────────────────────────────────────────────────────────────────────────
+# Dependencies that query the database are plain `def`: FastAPI runs them
+# in its threadpool, so the sync Session never blocks the event loop. They
+# share the request's session (get_db) with the endpoint, so the user row
+# is loaded once per request and no second pool connection is needed.
 
-async def get_current_user(
+def get_current_user(
     user_id: Optional[int] = None,
     authorization: Optional[str] = Header(default=None),
     db: Session = Depends(get_db)
-) -> models.User:
+) -> AuthUser:
     """
     Resolve the current user from Authorization: Bearer <JWT> or fallback user_id param.
+    
+    Returns a read-only AuthUser (id, username, email, role) from the user
+    cache (app/cache.py), not a User ORM object - usually no query at all.
+    Anything else about the user must be loaded with db.get(models.User, id).
     """
     resolved_user_id: Optional[int] = None
 
@@ -70,7 +120,7 @@ async def get_current_user(
             token = authorization.strip()
 
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = decode_access_token(token)
             sub = payload.get("sub")
             resolved_user_id = int(sub) if sub is not None else None
         except Exception:
@@ -95,7 +145,7 @@ async def get_current_user(
             detail="Not authenticated"
         )
 
-    user = db.query(models.User).filter(models.User.id == resolved_user_id).first()
+    user = get_auth_user(db, resolved_user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -105,7 +155,7 @@ async def get_current_user(
     return user
 
 
-async def require_owner(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def require_owner(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
     """
     Dependency: Only OWNER role can access
     """
@@ -117,7 +167,7 @@ async def require_owner(current_user: models.User = Depends(get_current_user)) -
     return current_user
 
 
-async def require_staff(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def require_staff(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
     """
     Dependency: STAFF or OWNER can access
     """
@@ -129,9 +179,9 @@ async def require_staff(current_user: models.User = Depends(get_current_user)) -
     return current_user
 
 
-async def check_permission(
+def check_permission(
     permission_name: str,
-    current_user: models.User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> bool:
     """
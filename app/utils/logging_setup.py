@@ -0,0 +1,50 @@
+"""
+Logging setup for background services.
+
+Records go into an in-memory queue (QueueHandler) and a QueueListener
+thread writes them to stdout. Code on the event loop (e.g. the printer
+watchdog) never blocks on a stdout write or its lock.
+"""
+
+import logging
+import logging.config
+import queue
+from logging.handlers import QueueListener
+
+_log_queue = queue.SimpleQueue()
+_listener = None
+
+
+def setup_logging(level: str = "INFO"):
+    """Route the service loggers through the queue and start the writer thread."""
+    global _listener
+    if _listener is not None:
+        return
+
+    logging.config.dictConfig({
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {
+            "queue": {
+                "class": "logging.handlers.QueueHandler",
+                "queue": _log_queue,
+            },
+        },
+        "loggers": {
+            "watchdog": {"handlers": ["queue"], "level": level, "propagate": False},
+        },
+    })
+
+    # No timestamp: journald / docker add their own
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(levelname)s [%(name)s] %(message)s"))
+    _listener = QueueListener(_log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
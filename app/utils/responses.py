@@ -0,0 +1,19 @@
+"""Response classes for returning Pydantic models without re-encoding them"""
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class PydanticResponse(JSONResponse):
+    """
+    JSON response whose content is a Pydantic model.
+
+    The body comes from model_dump_json() - Pydantic's own (Rust) serializer -
+    instead of FastAPI's response_model path, which validates the object a
+    second time and walks every field through jsonable_encoder first.
+
+    Usage:
+        return PydanticResponse(schemas.UserResponse.model_validate(user))
+    """
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json().encode("utf-8")